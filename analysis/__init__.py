@@ -0,0 +1,69 @@
+"""Data loading and analysis helpers shared by the dashboard pages.
+
+The package has no UI dependencies, so it can be used from batch jobs as well as from
+the Streamlit pages. Public functions are re-exported here and their modules are only
+imported on first use, so `import analysis` stays cheap:
+
+    import analysis
+    revenue_actuals = analysis.read_revenue_actuals('workbook.xlsx')
+"""
+import importlib
+
+_EXPORTS = {
+    'budget_totals': 'analysis.budget',
+    'classify_budget': 'analysis.budget',
+    'read_budget_lines': 'analysis.budget',
+    'wip_budget': 'analysis.budget',
+    'budget_bar_chart': 'analysis.charts',
+    'create_stacked_bar_chart': 'analysis.charts',
+    'revenue_line_chart': 'analysis.charts',
+    'first_breach': 'analysis.flags',
+    'flag_table': 'analysis.flags',
+    'red_flag_mask': 'analysis.flags',
+    'build_ledger': 'analysis.ledger',
+    'ledger_long': 'analysis.ledger',
+    'read_ledger': 'analysis.ledger',
+    'scan_portfolio': 'analysis.portfolio',
+    'project_flags': 'analysis.precompute',
+    'project_wip_summaries': 'analysis.precompute',
+    'start_precompute': 'analysis.precompute',
+    'project_budget_lines': 'analysis.projects',
+    'save_project': 'analysis.projects',
+    'clean_amount': 'analysis.revenue',
+    'clean_amounts': 'analysis.revenue',
+    'prepare_dataframe': 'analysis.revenue',
+    'build_cube': 'analysis.rollup',
+    'read_cube': 'analysis.rollup',
+    'scenario_inputs': 'analysis.scenarios',
+    'sensitivity': 'analysis.scenarios',
+    'ingest': 'analysis.snapshots',
+    'list_snapshots': 'analysis.snapshots',
+    'snapshot_delta': 'analysis.snapshots',
+    'stream_revenue_actuals': 'analysis.streaming',
+    'revenue_long': 'analysis.views',
+    'revenue_pivot': 'analysis.views',
+    'burn_down': 'analysis.wip',
+    'compare_wip': 'analysis.wip',
+    'dynamic_forecast': 'analysis.wip',
+    'forecast_comparison': 'analysis.wip',
+    'process_revenue_actuals': 'analysis.wip',
+    'summarize_budget': 'analysis.wip',
+    'wip_summaries': 'analysis.wip',
+    'open_workbook': 'analysis.workbook',
+    'read_revenue_actuals': 'analysis.workbook',
+    'read_revenue_index': 'analysis.workbook',
+    'read_sheet': 'analysis.workbook',
+    'sheet_names': 'analysis.workbook',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'analysis' has no attribute '{name}'")
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
+
+
+def __dir__():
+    return __all__
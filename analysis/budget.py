@@ -0,0 +1,111 @@
+"""Budget sheet classification and totals.
+
+A project's budget sheet is classified once: every row is matched against a fixed set of
+precompiled patterns in a single pass and tagged with the Flags and WIP categories it
+counts towards. The resulting budget lines are cached per sheet, and totals are a groupby
+over the tags instead of one regex scan of the sheet per category.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from analysis.workbook import cache, file_digest, read_sheet
+
+BUDGET_CATEGORIES = ['Number of Kits', 'Beginning WIP', 'Engineering Labor', 'Manufacturing Labor', 'Material Receipts', 'Other NRE Costs', 'Milestones', 'Kit Sales', 'Ending WIP']
+WIP_BUDGET_CATEGORIES = ['Engineering Labor', 'Other NRE', 'TRAVEL', 'Manufacturing Labor', 'Material Receipts']
+# revenue categories are budgeted as negative amounts
+NEGATED_CATEGORIES = ['Milestones', 'Kit Sales']
+
+# (column position, pattern) of every test applied to a budget row
+_PATTERNS = {
+    'nre_kit_travel': (0, re.compile('NRE|Kit|TRAVEL', re.IGNORECASE)),
+    'nre_kit_travel_space': (0, re.compile('NRE|Kit|TRAVEL ', re.IGNORECASE)),
+    'nre_travel_space': (0, re.compile('NRE|TRAVEL ', re.IGNORECASE)),
+    'kit': (0, re.compile('Kit', re.IGNORECASE)),
+    'other_nre': (0, re.compile('Other NRE')),
+    'other_nre_any_case': (0, re.compile('Other NRE', re.IGNORECASE)),
+    'other_nre_travel': (0, re.compile('Other NRE|TRAVEL', re.IGNORECASE)),
+    'travel': (0, re.compile('TRAVEL', re.IGNORECASE)),
+    'engineering_labor': (0, re.compile('Engineering Labor', re.IGNORECASE)),
+    'manufacturing_labor': (0, re.compile('Manufacturing Labor', re.IGNORECASE)),
+    'material': (0, re.compile('Material', re.IGNORECASE)),
+    'material_receipts': (0, re.compile('Material Receipts', re.IGNORECASE)),
+    'hour': (2, re.compile('Hour')),
+    'avg_qty_or_space': (5, re.compile('AVG cost based on Qty| ')),
+}
+
+# category tags as a function of the pattern matches of a row, per scheme
+_FLAG_TAGS = {
+    'Number of Kits': lambda m: m['nre_kit_travel'] and not m['other_nre'] and not m['avg_qty_or_space'],
+    'Beginning WIP': lambda m: m['nre_kit_travel_space'] and not m['other_nre'] and not m['hour'],
+    'Engineering Labor': lambda m: m['engineering_labor'],
+    'Manufacturing Labor': lambda m: m['manufacturing_labor'],
+    'Material Receipts': lambda m: m['material'],
+    'Other NRE Costs': lambda m: m['other_nre_travel'],
+    'Milestones': lambda m: m['nre_travel_space'] and not m['other_nre'],
+    'Kit Sales': lambda m: m['kit'] and not m['hour'],
+}
+_WIP_TAGS = {
+    'Engineering Labor': lambda m: m['engineering_labor'],
+    'Other NRE': lambda m: m['other_nre_any_case'],
+    'TRAVEL': lambda m: m['travel'],
+    'Manufacturing Labor': lambda m: m['manufacturing_labor'],
+    'Material Receipts': lambda m: m['material_receipts'],
+}
+
+
+def _matches(values):
+    return {name: isinstance(values[col], str) and pattern.search(values[col]) is not None
+            for name, (col, pattern) in _PATTERNS.items()}
+
+
+def classify_budget(budget_sheet):
+    """Tag every row of a budget sheet with its categories in one pass.
+
+    Returns one line per (row, scheme, category) with the row's Amount: the
+    'AVG cost based on Qty' quantity for Number of Kits, 'NRE ' + 'CR' otherwise.
+    """
+    columns = [budget_sheet.iloc[:, col].to_numpy(dtype=object) for col in (0, 2, 5)]
+    cost = (pd.to_numeric(budget_sheet['NRE '], errors='coerce').fillna(0)
+            + pd.to_numeric(budget_sheet['CR'], errors='coerce').fillna(0)).to_numpy()
+    kits = pd.to_numeric(budget_sheet['AVG cost based on Qty'], errors='coerce').fillna(0).to_numpy()
+
+    rows, schemes, categories = [], [], []
+    for row, (first, third, sixth) in enumerate(zip(*columns)):
+        m = _matches({0: first, 2: third, 5: sixth})
+        for scheme, tags in (('flags', _FLAG_TAGS), ('wip', _WIP_TAGS)):
+            for category, rule in tags.items():
+                if rule(m):
+                    rows.append(row)
+                    schemes.append(scheme)
+                    categories.append(category)
+
+    rows = np.asarray(rows, dtype=np.int64)
+    categories = np.asarray(categories, dtype=object)
+    amount = np.where(categories == 'Number of Kits', kits[rows], cost[rows]) if len(rows) else np.empty(0)
+    return pd.DataFrame({'Row': rows, 'Scheme': schemes, 'Category': categories, 'Amount': amount})
+
+
+def read_budget_lines(source, sheet_name):
+    """Return the classified budget lines of a sheet, classifying it only once per workbook."""
+    key = (file_digest(source), sheet_name, 'budget_lines')
+    return cache.get_or_load(key, lambda: classify_budget(read_sheet(source, sheet_name)))
+
+
+def _category_sums(budget_lines, scheme, categories):
+    lines = budget_lines[budget_lines['Scheme'] == scheme]
+    return lines.groupby('Category')['Amount'].sum().reindex(categories, fill_value=0.0)
+
+
+def budget_totals(budget_lines):
+    """Return a Series of the budget of each Flags category, indexed by category."""
+    totals = _category_sums(budget_lines, 'flags', BUDGET_CATEGORIES[:-1])
+    totals[NEGATED_CATEGORIES] = -totals[NEGATED_CATEGORIES]
+    totals['Ending WIP'] = totals[['Engineering Labor', 'Manufacturing Labor', 'Material Receipts', 'Other NRE Costs', 'Milestones', 'Kit Sales']].sum()
+    return totals
+
+
+def wip_budget(budget_lines, categories=WIP_BUDGET_CATEGORIES):
+    """Return the NRE + CR budget of each WIP category, indexed by category."""
+    return _category_sums(budget_lines, 'wip', categories)
@@ -0,0 +1,184 @@
+"""Figure builders for the dashboard pages.
+
+plotly and matplotlib are imported inside the builders, so importing the analysis
+package for batch work does not pay for the plotting libraries.
+"""
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from analysis.workbook import cache
+
+BUDGET_CHART_EXCLUDED = ['Number of Kits', 'Beginning WIP', 'Ending WIP', 'Milestones', 'Kit Sales']
+
+# points sent to the browser by the revenue chart, shared between its lines
+MAX_CHART_POINTS = 20_000
+MIN_LINE_POINTS = 100
+# above this many points the revenue chart uses WebGL traces instead of SVG
+WEBGL_POINTS = 5_000
+
+
+def lttb(x, y, n_out):
+    """Return the indices of the n_out points of a series kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; of every bucket in between, the point spanning the
+    largest triangle with the previously kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_bucket = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        next_x = x[next_bucket].mean()
+        next_ys = y[next_bucket][~np.isnan(y[next_bucket])]
+        next_y = next_ys.mean() if len(next_ys) else y[a]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        kept[i + 1] = a
+    return kept
+
+
+def revenue_line_chart(plot_df, categories, max_points=MAX_CHART_POINTS, webgl_points=WEBGL_POINTS):
+    """Line chart of the prepare_dataframe output, one line per project and category.
+
+    Lines are coloured by category and the last value of each category is labelled.
+    Lines longer than their share of max_points are downsampled with lttb, and WebGL
+    traces are used once the chart holds more than webgl_points points.
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    lines = list(plot_df.groupby(['Project', 'Category'], sort=False))
+    budget = max(MIN_LINE_POINTS, max_points // max(len(lines), 1))
+    trace = go.Scattergl if min(len(plot_df), budget * len(lines)) > webgl_points else go.Scatter
+    palette = px.colors.qualitative.Plotly
+    colors = {category: palette[i % len(palette)] for i, category in enumerate(pd.unique(plot_df['Category']))}
+
+    traces = []
+    shown = set()
+    for (project, category), line in lines:
+        dates = line['Date'].to_numpy()
+        amounts = line['Amount'].to_numpy()
+        if len(line) > budget:
+            kept = lttb(dates.astype('datetime64[ns]').astype(np.int64), amounts, budget)
+            dates, amounts = dates[kept], amounts[kept]
+        traces.append(trace(x=dates, y=amounts, mode='lines', name=category, legendgroup=category, showlegend=category not in shown,
+                            line=dict(color=colors[category]), hovertemplate=f'{project} {category}<br>%{{x}}: %{{y}}<extra></extra>'))
+        shown.add(category)
+    fig = go.Figure(data=traces)
+
+    # Add label for each line, all in one layout update
+    last_rows = plot_df[plot_df['Category'].isin(categories)].drop_duplicates('Category', keep='last')
+    annotations = [dict(x=date, y=round(amount, 0), text=f'{round(amount, 0)}', showarrow=False, xshift=35)  # xshift moves the label to the right
+                   for date, amount in zip(last_rows['Date'], last_rows['Amount'])]
+
+    fig.update_layout(annotations=annotations, legend_title_text='Category', xaxis_title='Date', yaxis_title='Amount',
+                      xaxis=dict(range=[plot_df['Date'].min(), plot_df['Date'].max() + pd.DateOffset(months=10)]))  # Extend the x-axis range by ten months
+    return fig
+
+
+def budget_bar_chart(project_budget):
+    """Matplotlib bar chart of Budget against Total Activity for the cost categories of the Flags table.
+
+    The figure is registered with pyplot; close it with plt.close when done, or use budget_bar_png.
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as mticker
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    project_budget_copy = project_budget[~project_budget['Category'].isin(BUDGET_CHART_EXCLUDED)]
+
+    categories = project_budget_copy['Category']
+    budget_values = project_budget_copy['Budget']
+    total_activity_values = project_budget_copy['Total Activity']
+
+    bar_width = 0.35
+    r1 = np.arange(len(categories))
+    r2 = r1 + bar_width
+
+    budget_bars = ax.bar(r1, budget_values, width=bar_width, label='Budget')
+    activity_bars = ax.bar(r2, total_activity_values, width=bar_width, label='Total Activity')
+
+    # one bar_label call per series instead of an ax.text per bar
+    ax.bar_label(budget_bars, labels=[f'{value/1000000:.1f}M' for value in budget_values])
+    ax.bar_label(activity_bars, labels=[f'{value/1000000:.1f}M' for value in total_activity_values])
+
+    ax.set_xticks(r1 + bar_width / 2)
+    ax.set_xticklabels(categories, rotation=45)
+
+    ax.legend()
+    ax.text(0.5, 0.95, 'Total Cost', transform=ax.transAxes, ha='center')
+    ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, p: f'{x/1000000:.1f}M'))
+    return fig
+
+
+def budget_bar_png(project_budget, dpi=200):
+    """Return budget_bar_chart rendered as PNG bytes, cached by a hash of the plotted values.
+
+    The figure is closed as soon as it is rendered, so nothing stays registered with pyplot.
+    """
+    import matplotlib.pyplot as plt
+
+    plotted = project_budget.loc[~project_budget['Category'].isin(BUDGET_CHART_EXCLUDED), ['Category', 'Budget', 'Total Activity']]
+    digest = hashlib.sha256(pd.util.hash_pandas_object(plotted, index=False).to_numpy().tobytes()).hexdigest()
+
+    def render():
+        fig = budget_bar_chart(project_budget)
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', bbox_inches='tight', dpi=dpi)
+            return buffer.getvalue()
+        finally:
+            plt.close(fig)
+
+    # images share the workbook cache and its memory budget
+    return cache.get_or_load((digest, None, ('budget_bar_chart', dpi)), render)
+
+
+def create_stacked_bar_chart(dataframe, title):
+    """Create a stacked bar chart from the given DataFrame."""
+    import plotly.graph_objects as go
+
+    categories = dataframe.index.tolist()
+    categories.remove(' ')  # Remove the blank rows if they exist
+    budget = dataframe.loc[categories, 'Budget']
+    actual_revenues = dataframe.loc[categories, 'Actual Revenues']
+    forecast = dataframe.loc[categories, 'Forcast']
+
+    fig = go.Figure(data=[
+        go.Bar(name='Budget', x=categories, y=budget),
+        go.Bar(name='Actual Revenues', x=categories, y=actual_revenues),
+        go.Bar(name='Forecast', x=categories, y=forecast)
+    ])
+
+    fig.update_layout(
+        title=title,
+        yaxis_title='Amounts',
+        # barmode='stack'
+    )
+    # change figure size
+    fig.update_layout(
+        autosize=False,
+        width=600,
+        height=475,
+    )
+    return fig
+
+
+def sensitivity_heatmap(table, title, zmid=None):
+    """Heatmap of a (Kits x Months) sensitivity table, colors centered on zmid when given."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Heatmap(z=table.to_numpy(), x=table.columns.astype(str), y=table.index.astype(str), colorscale='RdBu_r', zmid=zmid,
+                               hovertemplate='%{y} kits, %{x} months: %{z:,.2f}<extra></extra>'))
+    fig.update_layout(title=title, xaxis_title='Forecast Months', yaxis_title='Number of Kits', xaxis_type='category', yaxis_type='category')
+    return fig
@@ -0,0 +1,87 @@
+"""Budget red flags: the first month cumulative actuals cross the budget."""
+import numpy as np
+import pandas as pd
+
+from analysis.budget import budget_totals
+
+FLAG_CATEGORIES = ['Beginning WIP', 'Engineering Labor', 'Manufacturing Labor', 'Material Receipts', 'Other NRE Costs', 'Milestones', 'Kit Sales', 'Ending WIP']
+# revenue and WIP balances are negative amounts, so they breach when they fall below budget
+BREACH_BELOW = ['Milestones', 'Ending WIP']
+NO_RED_FLAG = 'No red flag'
+
+
+def first_breach(cumulative_data, budget, categories=FLAG_CATEGORIES, breach_below=BREACH_BELOW):
+    """Return the red_flags frame for all categories in one pass.
+
+    cumulative_data is indexed by Category with one column per month, budget is a Series
+    indexed by Category. The Red Flag of a category is the first month column where the
+    cumulative amount is over budget (under budget for breach_below categories), or
+    'No red flag' when it never crosses or the category has no actuals.
+    """
+    categories = list(categories)
+    rows = cumulative_data[~cumulative_data.index.duplicated()].reindex(categories)
+    values = rows.to_numpy(dtype=np.float64)
+    limits = budget.reindex(categories).to_numpy(dtype=np.float64)
+    direction = np.where(np.isin(categories, breach_below), -1.0, 1.0)
+
+    breached = (values - limits[:, None]) * direction[:, None] > 0
+    has_breach = breached.any(axis=1)
+    first = breached.argmax(axis=1)
+
+    flags = np.full(len(categories), NO_RED_FLAG, dtype=object)
+    flags[has_breach] = cumulative_data.columns.to_numpy(dtype=object)[first[has_breach]]
+    return pd.DataFrame({'Category': categories, 'Red Flag': flags})
+
+
+def flag_table(budget_lines, revenue_actuals, project_name):
+    """Return the Flags table of one project: budget, activity, per kit figures and red flags."""
+    totals = budget_totals(budget_lines)
+    Number_of_Kits = totals['Number of Kits']
+
+    # create project_budget dataframe with two column Category, and Budget
+    project_budget = pd.DataFrame({'Category': totals.index, 'Budget': totals.to_numpy()})
+
+    # rounnd Amount to 2 decimal places
+    project_budget['Budget'] = project_budget['Budget'].round(2)
+    project_budget['Budget per Kit'] = round(project_budget['Budget'] / Number_of_Kits, 2)
+
+    # filter revenue_actuals for column Project Name = project_name
+    revenue_actuals = revenue_actuals[revenue_actuals['Project #'] == project_name]
+
+    # merge project_budget and revenue_actuals on column Category
+    project_budget = project_budget.merge(revenue_actuals, how='left', on='Category')
+
+    cols = project_budget.columns.tolist()
+    project_budget = project_budget[cols[3:7] + cols[0:3] + [cols[-1]]]
+
+    project_budget['Total Activity'] = project_budget['Total Activity'].round(2)
+
+    # create column Activity per kit
+    project_budget['Activity per Kit'] = round(project_budget['Total Activity'] / Number_of_Kits, 2)
+
+    # create column difference between Budget and Total Activity
+    project_budget['Total Activity - Budget'] = project_budget['Total Activity'] - project_budget['Budget']
+
+    monthly_data = revenue_actuals[revenue_actuals.columns.tolist()[5:-1]]
+
+    # set first column as index
+    monthly_data = monthly_data.set_index(monthly_data.columns.tolist()[0])
+
+    # remove first column
+    monthly_data = monthly_data.iloc[:, 1:]
+
+    # cumulative sum of each row
+    cumulative_data = monthly_data.cumsum(axis=1)
+
+    red_flags = first_breach(cumulative_data, totals.drop('Number of Kits'))
+
+    return project_budget.merge(red_flags, how='left', on='Category')
+
+
+def red_flag_mask(flags):
+    """Boolean mask of the Red Flag cells holding a breach month, for highlighting.
+
+    Blank cells and 'No red flag' are not highlighted.
+    """
+    text = pd.Series(flags).astype(str)
+    return (~text.str.contains('nan', regex=False) & ~text.str.contains(NO_RED_FLAG, regex=False)).to_numpy()
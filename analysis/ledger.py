@@ -0,0 +1,140 @@
+"""Compact typed ledger of the 'Revenue Actuals ' sheet.
+
+The ledger holds one row per sheet row, indexed on categorical (Project #, Category)
+and sorted on that index (rows of the same pair stay in sheet order), so a pair is found
+by binary search instead of a scan of the sheet. Its columns are the months as an int32
+Period index (months since January 1970) and the values are the parsed amounts as one
+float64 block, with no object columns left.
+
+With ANALYSIS_LEDGER_DIR set, the ledger of every workbook is also written there as an
+uncompressed Arrow file named after the workbook digest, and later sessions memory-map
+that file instead of parsing the workbook again. This needs pyarrow; without it the
+ledger is only kept in memory.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis.revenue import DATE_FORMAT, FIRST_MONTH_COLUMN, REVENUE_SHEET, WIP_CATEGORIES, clean_amounts, month_columns
+from analysis.workbook import cache, file_digest, read_revenue_actuals
+
+LEDGER_DIR = os.environ.get('ANALYSIS_LEDGER_DIR')
+_EPOCH_MONTH = np.datetime64('1970-01', 'M')
+
+
+def month_periods(dates):
+    """Return the int32 period (months since January 1970) of each date."""
+    return (pd.DatetimeIndex(dates).to_numpy().astype('datetime64[M]') - _EPOCH_MONTH).astype(np.int32)
+
+
+def period_dates(periods):
+    """Return the first day of each period as datetime64[ns]."""
+    return (_EPOCH_MONTH + np.asarray(periods).astype('timedelta64[M]')).astype('datetime64[ns]')
+
+
+def build_ledger(revenue_actuals):
+    """Return the ledger of a Revenue Actuals frame."""
+    periods = month_periods(pd.to_datetime(month_columns(revenue_actuals), format=DATE_FORMAT))
+    amounts = clean_amounts(revenue_actuals.iloc[:, FIRST_MONTH_COLUMN:-1].to_numpy())
+    index = pd.MultiIndex.from_arrays([pd.Categorical(revenue_actuals['Project #'].to_numpy()),
+                                       pd.Categorical(revenue_actuals['Category'].to_numpy())], names=['Project #', 'Category'])
+    ledger = pd.DataFrame(amounts, index=index, columns=pd.Index(periods, name='Period'))
+    return ledger.iloc[np.lexsort((index.codes[1], index.codes[0]))]
+
+
+def ledger_long(ledger, projects, categories, now=None):
+    """Return the long Date/Amount/Project/Category frame of the selection, like prepare_dataframe.
+
+    Only the first sheet row of each project/category pair is used, months on or after
+    now are dropped and pairs are ordered by project, then category, as given.
+    """
+    now = pd.Timestamp.now().floor('s') if now is None else pd.Timestamp(now)
+    dates = period_dates(ledger.columns.to_numpy())
+    valid = dates < now.to_datetime64()
+    return long_frame(ledger, projects, categories, dates[valid], valid)
+
+
+def long_frame(frame, projects, categories, dates, columns=slice(None)):
+    """Return the Date/Amount/Project/Category frame of the first row of each selected pair of a sorted ledger-like frame.
+
+    dates are the labels of the selected columns of frame.
+    """
+    projects = list(dict.fromkeys(projects))
+    categories = [c for c in dict.fromkeys(categories) if c not in WIP_CATEGORIES]
+
+    # binary search of every pair in the sorted index
+    pairs, starts = [], []
+    for project in projects:
+        for category in categories:
+            start, stop = _pair_bounds(frame.index, project, category)
+            if stop > start:
+                pairs.append((project, category))
+                starts.append(start)
+
+    amounts = frame.to_numpy()[starts][:, columns]
+    n_rows, n_dates = amounts.shape
+    keys = pd.MultiIndex.from_tuples(pairs, names=frame.index.names) if pairs else frame.index[:0]
+    return pd.DataFrame({
+        'Date': np.tile(dates, n_rows),
+        'Amount': amounts.ravel(),
+        'Project': np.repeat(np.asarray(keys.get_level_values(0)), n_dates),
+        'Category': np.repeat(np.asarray(keys.get_level_values(1)), n_dates),
+    })
+
+
+def _pair_bounds(index, project, category):
+    try:
+        return index.slice_locs((project, category), (project, category))
+    except (KeyError, TypeError):
+        return 0, 0
+
+
+def save_ledger(ledger, path):
+    """Write the ledger to an uncompressed Arrow (Feather v2) file that can be memory-mapped."""
+    import pyarrow.feather as feather
+
+    # Arrow column names are strings
+    table = ledger.set_axis(ledger.columns.astype(str), axis=1).reset_index()
+    feather.write_feather(table, path, compression='uncompressed')
+
+
+def load_ledger(path):
+    """Read a ledger written by save_ledger, memory-mapping the file."""
+    import pyarrow.feather as feather
+
+    ledger = feather.read_table(path, memory_map=True).to_pandas().set_index(['Project #', 'Category'])
+    return ledger.set_axis(pd.Index(ledger.columns.astype(np.int32), name='Period'), axis=1)
+
+
+def read_ledger(source, ledger_dir=LEDGER_DIR):
+    """Return the ledger of the workbook, built once per workbook content.
+
+    With ledger_dir set and pyarrow installed, the ledger is reloaded from and saved to
+    <ledger_dir>/<digest>.arrow.
+    """
+    digest = file_digest(source)
+
+    def load():
+        path = _ledger_path(ledger_dir, digest)
+        if path is not None and os.path.exists(path):
+            return load_ledger(path)
+        ledger = build_ledger(read_revenue_actuals(source))
+        if path is not None:
+            os.makedirs(ledger_dir, exist_ok=True)
+            # write under a temporary name, so a concurrent reader never maps a partial file
+            save_ledger(ledger, path + '.tmp')
+            os.replace(path + '.tmp', path)
+        return ledger
+
+    return cache.get_or_load((digest, REVENUE_SHEET, 'ledger'), load)
+
+
+def _ledger_path(ledger_dir, digest):
+    if not ledger_dir:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return os.path.join(ledger_dir, f'{digest}.arrow')
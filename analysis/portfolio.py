@@ -0,0 +1,92 @@
+"""Portfolio-wide red flag scan over every project that has a budget sheet or a saved budget.
+
+Budget sheets are parsed in a process pool; each worker opens the workbook once and
+evaluates the projects handed to it. Projects saved from the Template page are handed
+to the workers with their stored budget lines. Also usable as a command:
+
+    python -m analysis.portfolio workbook.xlsx -o portfolio_flags.csv
+"""
+import argparse
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from analysis.budget import classify_budget
+from analysis.flags import flag_table
+from analysis.projects import saved_budget_lines, saved_projects
+from analysis.store import store_signature
+from analysis.workbook import cache, file_digest, read_bytes, read_revenue_actuals, sheet_names
+
+SUMMARY_COLUMNS = ['Project', 'Category', 'Budget', 'Total Activity', 'Total Activity - Budget', 'Red Flag']
+
+# workbook handle of a pool worker, opened once by _init_worker
+_excel_file = None
+
+
+def _init_worker(data):
+    global _excel_file
+    _excel_file = pd.ExcelFile(io.BytesIO(data))
+
+
+def _scan_project(project_name, project_actuals, budget_lines=None):
+    if budget_lines is None:
+        budget_lines = classify_budget(_excel_file.parse(project_name))
+    table = flag_table(budget_lines, project_actuals, project_name)
+    table.insert(0, 'Project', project_name)
+    return table[SUMMARY_COLUMNS]
+
+
+def portfolio_projects(source, saved=False):
+    """Return the projects of Revenue Actuals that have a budget sheet of the same name, or, with saved, a saved budget."""
+    names = set(sheet_names(source)) | (set(saved_projects()) if saved else set())
+    return [p for p in read_revenue_actuals(source)['Project #'].unique() if p in names]
+
+
+def scan_portfolio(source, max_workers=None):
+    """Return budget, activity, variance and first breach month for every project and category.
+
+    The summary is cached per workbook and version of the store, so reruns of the page
+    reuse it until a project is saved.
+    """
+    return cache.get_or_load((file_digest(source), None, ('portfolio', store_signature())), lambda: _scan(source, max_workers))
+
+
+def _scan(source, max_workers):
+    revenue_actuals = read_revenue_actuals(source)
+    projects = portfolio_projects(source, saved=True)
+    if not projects:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    actuals = {p: rows for p, rows in revenue_actuals[revenue_actuals['Project #'].isin(projects)].groupby('Project #', sort=False)}
+    # stored budgets take precedence over the sheets, as in project_budget_lines
+    budget_lines = [saved_budget_lines(p) for p in projects]
+    data = read_bytes(source)
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(projects))
+    if max_workers == 1:
+        _init_worker(data)
+        tables = [_scan_project(p, actuals[p], lines) for p, lines in zip(projects, budget_lines)]
+    else:
+        # spawn rather than fork: the Streamlit server is multi-threaded
+        with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(data,)) as pool:
+            tables = list(pool.map(_scan_project, projects, [actuals[p] for p in projects], budget_lines))
+    return pd.concat(tables, ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluate budgets and red flags for every project of a workbook.')
+    parser.add_argument('workbook', help='path to the Excel workbook')
+    parser.add_argument('-o', '--output', default='portfolio_flags.csv', help='CSV file to write the summary to')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: all cores)')
+    args = parser.parse_args(argv)
+
+    summary = scan_portfolio(args.workbook, max_workers=args.jobs)
+    summary.to_csv(args.output, index=False)
+    print(f"{summary['Project'].nunique()} projects written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Background precomputation of the per-project results of an uploaded workbook.
+
+Once a workbook is uploaded, a small thread pool parses the whole Revenue Actuals sheet
+and then, project by project, the budget lines, the flags table and the WIP inputs (and
+the WIP summaries for a given number of kits). Results are stored in the workbook cache
+under (workbook digest, project, ...), so the project_* functions below are cache
+lookups once the warm-up has reached a project, and compute the result themselves
+otherwise. Nothing is lost when an entry is evicted, it is simply recomputed.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from analysis.budget import read_budget_lines
+from analysis.flags import flag_table
+from analysis.projects import saved_budget_lines, saved_projects
+from analysis.wip import process_revenue_actuals, wip_summaries
+from analysis.workbook import cache, file_digest, read_revenue_actuals, sheet_names
+
+PRECOMPUTE_WORKERS = 2
+# warm-ups kept in the registry, the least recently used one is dropped first
+MAX_WARMUPS = 8
+
+
+def _month():
+    # the WIP actuals split the months at the current one, so they expire with it
+    return pd.Timestamp.now().strftime('%Y-%m')
+
+
+def _flags_key(digest, project_name):
+    return digest, project_name, 'flags'
+
+
+def _wip_actuals_key(digest, project_name):
+    return digest, project_name, ('wip actuals', _month())
+
+
+def _wip_summaries_key(digest, project_name, number_of_kits):
+    return digest, project_name, ('wip summaries', number_of_kits, _month())
+
+
+def project_flags(source, project_name):
+    """Return the flag_table of a project.
+
+    Projects saved from the Template page use their stored budget and are not cached,
+    so a project saved again is picked up on the next run.
+    """
+    saved = saved_budget_lines(project_name)
+    if saved is not None:
+        return flag_table(saved, read_revenue_actuals(source, projects=[project_name]), project_name)
+    return cache.get_or_load(_flags_key(file_digest(source), project_name), lambda: flag_table(
+        read_budget_lines(source, project_name), read_revenue_actuals(source, projects=[project_name]), project_name))
+
+
+def project_wip_actuals(source, project_name):
+    """Return the process_revenue_actuals rows of a project."""
+    return cache.get_or_load(_wip_actuals_key(file_digest(source), project_name), lambda: process_revenue_actuals(
+        read_revenue_actuals(source, projects=[project_name]), [project_name]))
+
+
+def project_wip_summaries(source, project_name, number_of_kits):
+    """Return the wip_summaries of a project for a number of kits, from its stored budget when it has one."""
+    saved = saved_budget_lines(project_name)
+    if saved is not None:
+        return wip_summaries(saved, project_wip_actuals(source, project_name), number_of_kits)
+    return cache.get_or_load(_wip_summaries_key(file_digest(source), project_name, number_of_kits), lambda: wip_summaries(
+        read_budget_lines(source, project_name), project_wip_actuals(source, project_name), number_of_kits))
+
+
+class Warmup:
+    """Precomputation of every project of one workbook, running in a background pool.
+
+    error holds the exception that stopped the warm-up before any project was started,
+    errors those of single projects.
+    """
+
+    def __init__(self, source, number_of_kits=None, max_workers=PRECOMPUTE_WORKERS):
+        self.digest = file_digest(source)
+        self.number_of_kits = number_of_kits
+        self.projects = []
+        self.error = None
+        self.errors = {}
+        # False once a pass left some of its results out of the cache, see refresh
+        self.fits = True
+        self._saved = set()
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._done = 0
+        self._futures = []
+        self._cancelled = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='precompute')
+        self._prepared = self._executor.submit(self._prepare, source)
+
+    def _prepare(self, source):
+        try:
+            # the whole sheet first, so that every project is sliced from it instead of streamed
+            revenue_actuals = read_revenue_actuals(source)
+            self._saved = set(saved_projects())
+            names = set(sheet_names(source)) | self._saved
+            with self._lock:
+                if not self._cancelled:
+                    self.projects = [p for p in revenue_actuals['Project #'].unique() if p in names]
+                    self._futures = [self._executor.submit(self._run, source, p) for p in self.projects]
+        except Exception as e:
+            self.error = e
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def _run(self, source, project_name):
+        try:
+            project_flags(source, project_name)
+            project_wip_actuals(source, project_name)
+            if self.number_of_kits is not None:
+                project_wip_summaries(source, project_name, self.number_of_kits)
+        except Exception as e:
+            # a malformed budget sheet fails again, visibly, when the project is selected
+            self.errors[project_name] = e
+        finally:
+            with self._lock:
+                self._done += 1
+                last = self._done == self.total
+            if last:
+                self.fits = not self.missing()
+
+    @property
+    def total(self):
+        return len(self.projects)
+
+    @property
+    def done(self):
+        return self._done
+
+    @property
+    def finished(self):
+        return self._prepared.done() and all(f.done() for f in self._futures)
+
+    def _result_keys(self, project_name):
+        keys = [_wip_actuals_key(self.digest, project_name)]
+        # saved projects read their stored budget and are not cached
+        if project_name not in self._saved:
+            keys.append(_flags_key(self.digest, project_name))
+            if self.number_of_kits is not None:
+                keys.append(_wip_summaries_key(self.digest, project_name, self.number_of_kits))
+        return keys
+
+    def missing(self):
+        """Return the projects whose results were evicted from the cache, or expired with the month."""
+        return [p for p in self.projects if p not in self.errors and any(key not in cache for key in self._result_keys(p))]
+
+    def refresh(self, source):
+        """Run a finished warm-up again for the projects whose results are missing.
+
+        A warm-up whose last pass did not fit in the cache is not run again, since that
+        would only evict the results of the projects being looked at.
+        """
+        if not self.finished or not self.fits or self._cancelled:
+            return
+        missing = self.missing()
+        if not missing:
+            return
+        with self._lock:
+            self._done = self.total - len(missing)
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='precompute')
+            self._futures = [self._executor.submit(self._run, source, p) for p in missing]
+            self._executor.shutdown(wait=False)
+
+    def cancel(self):
+        """Drop the projects that have not been started yet."""
+        with self._lock:
+            self._cancelled = True
+            self._done += sum(f.cancel() for f in self._futures)
+
+
+_warmups = OrderedDict()
+_warmups_lock = threading.Lock()
+
+
+def start_precompute(source, number_of_kits=None):
+    """Start, or return the running, warm-up of a workbook.
+
+    A warm-up for another number of kits replaces the pending part of the previous one,
+    and a finished warm-up is run again for the projects whose results are no longer
+    cached, see Warmup.refresh. At most MAX_WARMUPS workbooks are tracked.
+    """
+    digest = file_digest(source)
+    with _warmups_lock:
+        warmup = _warmups.get(digest)
+        if warmup is not None and (number_of_kits is None or warmup.number_of_kits == number_of_kits):
+            _warmups.move_to_end(digest)
+            warmup.refresh(source)
+            return warmup
+        if warmup is not None:
+            warmup.cancel()
+        _warmups[digest] = warmup = Warmup(source, number_of_kits)
+        _warmups.move_to_end(digest)
+        while len(_warmups) > MAX_WARMUPS:
+            _warmups.popitem(last=False)[1].cancel()
+        return warmup
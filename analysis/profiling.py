@@ -0,0 +1,104 @@
+"""Per-stage timing and memory instrumentation.
+
+A Profiler records one span per stage of a page run (load, transform, flags, chart,
+render). Each span holds its wall time, the resident memory after the stage and the
+process high-water mark. With ANALYSIS_TRACE_MEMORY=1 it also holds the peak of Python
+and numpy allocations during the stage, which is slower and counts all sessions
+of the process. When ANALYSIS_PROFILE_LOG names a file, every span is appended to it
+as one JSON line.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_LOG = os.environ.get('ANALYSIS_PROFILE_LOG')
+TRACE_MEMORY = os.environ.get('ANALYSIS_TRACE_MEMORY') == '1'
+MB = 1024 * 1024
+
+_log_lock = threading.Lock()
+
+
+def current_rss():
+    """Resident set size of the process in bytes, None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss():
+    """High-water mark of the resident set size of the process in bytes, None where resource is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profiler:
+    """Collects the stage spans of one page run.
+
+    on_span is called with the profiler after every span, e.g. to refresh a panel.
+    """
+
+    def __init__(self, page, log_path=PROFILE_LOG, trace_memory=TRACE_MEMORY, on_span=None):
+        self.page = page
+        self.log_path = log_path
+        self.trace_memory = trace_memory
+        self.on_span = on_span
+        self.spans = []
+
+    @contextmanager
+    def span(self, stage):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            rss = current_rss()
+            peak = peak_rss()
+            record = {
+                'page': self.page,
+                'stage': stage,
+                'seconds': round(seconds, 6),
+                'rss_mb': round(rss / MB, 1) if rss is not None else None,
+                'peak_rss_mb': round(peak / MB, 1) if peak is not None else None,
+            }
+            if self.trace_memory:
+                record['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+            self.spans.append(record)
+            self._log(record)
+            if self.on_span is not None:
+                self.on_span(self)
+
+    def _log(self, record):
+        if not self.log_path:
+            return
+        line = json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **record})
+        with _log_lock, open(self.log_path, 'a') as f:
+            f.write(line + '\n')
+
+    @property
+    def total_seconds(self):
+        return sum(span['seconds'] for span in self.spans)
+
+    def frame(self):
+        """Return the spans recorded so far, one row per stage."""
+        columns = ['stage', 'seconds', 'rss_mb', 'peak_rss_mb'] + (['traced_peak_mb'] if self.trace_memory else [])
+        return pd.DataFrame(self.spans, columns=['page'] + columns)[columns].set_index('stage')
@@ -0,0 +1,135 @@
+"""Projects entered on the Template page, kept in the local store.
+
+A saved project keeps its form entries and, indexed by project, the budget lines derived
+from them in the layout of read_budget_lines (Row, Scheme, Category, Amount), with the
+Flags and WIP categories checked by the schema. The Flags and WIP pages read a stored
+project's budget with one indexed query instead of parsing its Excel budget sheet. The
+names of the saved projects are kept in memory until the store file changes, so looking
+up a project that was not saved does not query the store, nor create it.
+"""
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from analysis.budget import BUDGET_CATEGORIES, WIP_BUDGET_CATEGORIES, read_budget_lines
+from analysis.store import store_path, store_signature, transaction
+
+NRE_ENTRIES = ['Labor', 'Travel', 'Other NRE']
+RECURRING_ENTRIES = ['Monuments', 'Panels', 'Kits (Materials Receipts)', 'Kits (Manufacturing Labor)']
+
+# (scheme, category) budget lines of each Template entry. Entries are costs, with no hour
+# rows to leave out as classify_budget does for a sheet: every NRE entry also counts towards
+# Beginning WIP and Milestones and every Kit entry towards Beginning WIP and Kit Sales, so
+# Ending WIP is the net. Monuments and Panels are stored but count towards no category.
+_NRE_LINES = [('flags', 'Beginning WIP'), ('flags', 'Milestones')]
+_KIT_LINES = [('flags', 'Beginning WIP'), ('flags', 'Kit Sales')]
+ENTRY_CATEGORIES = {
+    'Labor': [('flags', 'Engineering Labor'), ('wip', 'Engineering Labor')] + _NRE_LINES,
+    'Travel': [('flags', 'Other NRE Costs'), ('wip', 'TRAVEL')] + _NRE_LINES,
+    'Other NRE': [('flags', 'Other NRE Costs'), ('wip', 'Other NRE')] + _NRE_LINES,
+    'Monuments': [],
+    'Panels': [],
+    'Kits (Materials Receipts)': [('flags', 'Material Receipts'), ('wip', 'Material Receipts')] + _KIT_LINES,
+    'Kits (Manufacturing Labor)': [('flags', 'Manufacturing Labor'), ('wip', 'Manufacturing Labor')] + _KIT_LINES,
+}
+# entries that count towards no budget category
+UNBUDGETED_ENTRIES = [entry for entry, lines in ENTRY_CATEGORIES.items() if not lines]
+
+LINE_COLUMNS = ['Row', 'Scheme', 'Category', 'Amount']
+
+
+def _in(values):
+    return ', '.join(f"'{v}'" for v in values)
+
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    hourly_rate REAL NOT NULL DEFAULT 0,
+    project_date TEXT,
+    number_of_kits INTEGER NOT NULL DEFAULT 0,
+    saved_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS project_entries (
+    project INTEGER NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    section TEXT NOT NULL CHECK (section IN ('NRE', 'Recurring')),
+    entry TEXT NOT NULL CHECK (entry IN ({_in(ENTRY_CATEGORIES)})),
+    cost REAL NOT NULL,
+    PRIMARY KEY (project, row)
+);
+CREATE TABLE IF NOT EXISTS project_budget_lines (
+    project INTEGER NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+    row INTEGER NOT NULL,
+    scheme TEXT NOT NULL CHECK (scheme IN ('flags', 'wip')),
+    category TEXT NOT NULL CHECK (category IN ({_in(dict.fromkeys(BUDGET_CATEGORIES + WIP_BUDGET_CATEGORIES))})),
+    amount REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS project_budget_lines_project ON project_budget_lines (project, scheme);
+'''
+
+
+def entry_budget_lines(entries, number_of_kits=0):
+    """Return the budget lines of (section, entry, cost) Template entries, row 0 holding the Number of Kits."""
+    lines = [(0, 'flags', 'Number of Kits', float(number_of_kits))]
+    lines += [(row, scheme, category, float(cost)) for row, (_, entry, cost) in enumerate(entries, start=1)
+              for scheme, category in ENTRY_CATEGORIES[entry]]
+    return pd.DataFrame(lines, columns=LINE_COLUMNS)
+
+
+def save_project(name, entries, hourly_rate=0.0, project_date=None, number_of_kits=0, path=None):
+    """Save a project and its (section, entry, cost) entries, replacing a saved project of the same name."""
+    lines = entry_budget_lines(entries, number_of_kits)
+    with transaction(path, SCHEMA) as conn:
+        conn.execute('DELETE FROM projects WHERE name = ?', (name,))
+        project = conn.execute('INSERT INTO projects (name, hourly_rate, project_date, number_of_kits, saved_at) VALUES (?, ?, ?, ?, ?)',
+                               (name, float(hourly_rate), str(project_date) if project_date else None, int(number_of_kits),
+                                datetime.now().isoformat(timespec='seconds'))).lastrowid
+        conn.executemany('INSERT INTO project_entries VALUES (?, ?, ?, ?, ?)',
+                         ((project, row, section, entry, float(cost)) for row, (section, entry, cost) in enumerate(entries, start=1)))
+        conn.executemany('INSERT INTO project_budget_lines VALUES (?, ?, ?, ?, ?)',
+                         ((project, *line) for line in lines.itertuples(index=False)))
+    with _names_lock:
+        _names.pop(store_path(path), None)
+    return project
+
+
+# store file -> (store signature, saved project names)
+_names = {}
+_names_lock = threading.Lock()
+
+
+def saved_projects(path=None):
+    """Return the names of the saved projects."""
+    signature = store_signature(path)
+    if signature is None:
+        return []
+    with _names_lock:
+        known = _names.get(store_path(path))
+    if known is not None and known[0] == signature:
+        return list(known[1])
+    with transaction(path, SCHEMA) as conn:
+        names = [name for (name,) in conn.execute('SELECT name FROM projects ORDER BY name')]
+    with _names_lock:
+        _names[store_path(path)] = signature, names
+    return list(names)
+
+
+def saved_budget_lines(name, path=None):
+    """Return the budget lines of a saved project, None if no project of that name is saved."""
+    if str(name) not in saved_projects(path):
+        return None
+    with transaction(path, SCHEMA) as conn:
+        project = conn.execute('SELECT id FROM projects WHERE name = ?', (str(name),)).fetchone()
+        if project is None:
+            return None
+        return pd.read_sql_query('SELECT row AS Row, scheme AS Scheme, category AS Category, amount AS Amount'
+                                 ' FROM project_budget_lines WHERE project = ? ORDER BY rowid', conn, params=project)
+
+
+def project_budget_lines(source, project_name, path=None):
+    """Return the budget lines of a project, from the store when it was saved there, else from its budget sheet."""
+    lines = saved_budget_lines(project_name, path)
+    return read_budget_lines(source, project_name) if lines is None else lines
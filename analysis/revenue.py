@@ -0,0 +1,78 @@
+"""Transformations of the 'Revenue Actuals ' sheet."""
+import numpy as np
+import pandas as pd
+
+REVENUE_SHEET = 'Revenue Actuals '
+REVENUE_SKIPROWS = 33
+# Revenue Actuals layout: six descriptive columns, one column per month, then 'Total Activity'
+FIRST_MONTH_COLUMN = 6
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+WIP_CATEGORIES = ['Beginning WIP', 'Ending WIP']
+
+
+def clean_amount(x):
+    if isinstance(x, str):
+        x = x.replace(',', '').replace('(', '-').replace(')', '')
+    return float(x) if x else 0
+
+
+def clean_amounts(values):
+    """Parse a block of amounts in one pass.
+
+    Strings such as '(1,234)' become -1234.0 and empty strings become 0, matching the
+    single cell rules of clean_amount. Numeric cells are passed through as floats.
+    Returns a float64 ndarray with the shape of values.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'biuf':
+        return values.astype(np.float64)
+    flat = values.ravel()
+    is_text = np.fromiter((isinstance(v, str) for v in flat), dtype=bool, count=flat.size)
+    amounts = pd.to_numeric(pd.Series(np.where(is_text, None, flat)), errors='coerce').to_numpy(dtype=np.float64)
+    if is_text.any():
+        text = (pd.Series(flat[is_text], dtype=object)
+                  .str.replace(',', '', regex=False)
+                  .str.replace('(', '-', regex=False)
+                  .str.replace(')', '', regex=False)
+                  .replace('', '0'))
+        amounts[is_text] = pd.to_numeric(text, errors='coerce').to_numpy(dtype=np.float64)
+    return amounts.reshape(values.shape)
+
+
+def month_columns(df):
+    """Return the month column labels of a Revenue Actuals frame."""
+    return df.columns[FIRST_MONTH_COLUMN:-1]
+
+
+def prepare_dataframe(df, projects, categories, cumulative=False, now=None):
+    """Return the long Date/Amount/Project/Category frame for the selected rows.
+
+    The month columns of all selected project/category rows are parsed as one block, so the
+    cost does not grow with the number of pairs selected. Months on or after now are dropped
+    after the optional running total, and rows are ordered by project, then category, as given.
+    """
+    now = pd.Timestamp.now().floor('s') if now is None else pd.Timestamp(now)
+    projects = list(dict.fromkeys(projects))
+    categories = [c for c in dict.fromkeys(categories) if c not in WIP_CATEGORIES]
+
+    rows = df[df['Project #'].isin(projects) & df['Category'].isin(categories)]
+    # like the per-pair filter, only the first row of each project/category pair is used
+    rows = rows.drop_duplicates(['Project #', 'Category'])
+    project_codes = pd.Categorical(rows['Project #'], categories=projects).codes.astype(np.int64)
+    category_codes = pd.Categorical(rows['Category'], categories=categories).codes
+    rows = rows.iloc[np.argsort(project_codes * len(categories) + category_codes, kind='stable')]
+
+    dates = pd.to_datetime(month_columns(df), format=DATE_FORMAT)
+    amounts = clean_amounts(rows.iloc[:, FIRST_MONTH_COLUMN:-1].to_numpy())
+    if cumulative:
+        amounts = np.cumsum(amounts, axis=1)
+    valid = dates < now
+    amounts = amounts[:, valid]
+
+    n_rows, n_dates = amounts.shape
+    return pd.DataFrame({
+        'Date': np.tile(dates[valid], n_rows),
+        'Amount': amounts.ravel(),
+        'Project': np.repeat(rows['Project #'].to_numpy(), n_dates),
+        'Category': np.repeat(rows['Category'].to_numpy(), n_dates),
+    })
@@ -0,0 +1,108 @@
+"""Rollup cube of the Revenue Actuals ledger at month, quarter, fiscal year and to-date level.
+
+The cube is built once per workbook (and day, since months on or after today are left
+out like everywhere else): every level is one float64 block with the ledger's sorted
+(Project #, Category) index and one column per period, labelled with the first day of
+the period. Coarser levels are a single matrix product of the monthly block with a
+month-to-period indicator, and blank months count as zero in them. Zooming out is then
+a lookup in the cached cube instead of a re-aggregation of the month columns.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from analysis.ledger import long_frame, period_dates, read_ledger
+from analysis.revenue import REVENUE_SHEET
+from analysis.workbook import cache, file_digest
+
+GRANULARITIES = ['Month', 'Quarter', 'Fiscal Year', 'To Date']
+# first calendar month of the fiscal year
+FISCAL_YEAR_START = int(os.environ.get('ANALYSIS_FISCAL_YEAR_START', '1'))
+
+
+def period_starts(dates, granularity, fiscal_year_start=FISCAL_YEAR_START):
+    """Return the first day of the period of the given granularity that each month belongs to."""
+    dates = pd.DatetimeIndex(dates)
+    if granularity == 'Month':
+        return dates
+    if granularity == 'Quarter':
+        return dates.to_period('Q').start_time
+    if granularity == 'Fiscal Year':
+        years = dates.year - (dates.month < fiscal_year_start)
+        return pd.to_datetime(pd.DataFrame({'year': years, 'month': fiscal_year_start, 'day': 1}))
+    if granularity == 'To Date':
+        # one period starting with the first month
+        return pd.DatetimeIndex([dates.min()] * len(dates))
+    raise ValueError(f'unknown granularity {granularity!r}, expected one of {GRANULARITIES}')
+
+
+def month_level(ledger, now=None):
+    """Return the Month level of the cube: the ledger months before now, labelled with their first day."""
+    now = pd.Timestamp.now().floor('s') if now is None else pd.Timestamp(now)
+    dates = period_dates(ledger.columns.to_numpy())
+    valid = dates < now.to_datetime64()
+    months = ledger.iloc[:, valid]
+    months.columns = pd.DatetimeIndex(dates[valid], name='Date')
+    return months
+
+
+def roll_up(months, granularity, fiscal_year_start=FISCAL_YEAR_START):
+    """Return the Month level rolled up to a coarser granularity."""
+    if granularity == 'Month':
+        return months
+    labels, groups = np.unique(period_starts(months.columns, granularity, fiscal_year_start), return_inverse=True)
+    indicator = np.zeros((len(groups), len(labels)))
+    indicator[np.arange(len(groups)), groups] = 1.0
+    return pd.DataFrame(np.nan_to_num(months.to_numpy()) @ indicator, index=months.index, columns=pd.DatetimeIndex(labels, name='Date'))
+
+
+def build_cube(ledger, now=None, fiscal_year_start=FISCAL_YEAR_START):
+    """Return {granularity: frame} of the ledger months before now, rolled up to every granularity."""
+    months = month_level(ledger, now)
+    return {granularity: roll_up(months, granularity, fiscal_year_start) for granularity in GRANULARITIES}
+
+
+def read_cube(source, granularity):
+    """Return one level of the rollup cube of the workbook, once per day.
+
+    Every level is loaded through the cache on its own, the coarser ones from the cached
+    Month level, so concurrent loads share one build and an evicted level is rolled up
+    again without rebuilding the others.
+    """
+    digest = file_digest(source)
+    day = pd.Timestamp.now().normalize()
+
+    def key(level):
+        return digest, REVENUE_SHEET, ('cube', level, FISCAL_YEAR_START, day)
+
+    months = cache.get_or_load(key('Month'), lambda: month_level(read_ledger(source)))
+    if granularity == 'Month':
+        return months
+    return cache.get_or_load(key(granularity), lambda: roll_up(months, granularity))
+
+
+def period_labels(starts, granularity, fiscal_year_start=FISCAL_YEAR_START):
+    """Display labels of period start dates: 2024-05, 2024Q2, FY2025 (named after the year it ends in) or To Date."""
+    starts = pd.DatetimeIndex(starts)
+    if granularity == 'Month':
+        return starts.strftime('%Y-%m')
+    if granularity == 'Quarter':
+        return starts.to_period('Q').astype(str)
+    if granularity == 'Fiscal Year':
+        return pd.Index([f'FY{year + (fiscal_year_start > 1)}' for year in starts.year])
+    return pd.Index(['To Date'] * len(starts))
+
+
+def cube_long(level, projects, categories):
+    """Return the long Date/Amount/Project/Category frame of the selection at one cube level, like prepare_dataframe."""
+    return long_frame(level, projects, categories, level.columns.to_numpy())
+
+
+def project_activity(level, project):
+    """Return the activity of every category of a project at one cube level, summed over its sheet rows."""
+    try:
+        rows = level.loc[project]
+    except KeyError:
+        return pd.DataFrame(columns=level.columns)
+    return rows.groupby(level='Category', sort=False, observed=True).sum()
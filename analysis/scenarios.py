@@ -0,0 +1,58 @@
+"""What-if sensitivity of a project's WIP budget to the number of kits and forecast months.
+
+The dynamic forecast burns a budget down at the actuals per kit each month. Here that
+forecast is evaluated for a whole grid of kit counts and months at once: one broadcast
+of the (category, kits, months) array gives the projected actuals, the remaining budget
+and the cost per kit of every scenario, from the budget and actuals of the WIP summaries.
+"""
+import numpy as np
+import pandas as pd
+
+SCENARIO_CATEGORIES = ['Engineering Labor', 'Other NRE', 'Travel', 'Total NRE', 'Manufacturing Labor', 'Material Receipts', 'Total Kits']
+SCENARIO_MEASURES = ['Remaining on Budget', 'Cost per Kit']
+# largest (category x kits x months) grid evaluated
+MAX_SCENARIO_CELLS = 1_000_000
+# summary rows of the scenario categories
+_NRE_ROWS = ['Engineering Labor', 'Other NRE', 'TRAVEL', 'Total']
+_KIT_ROWS = ['Manufacturing Labor', 'Material Receipts', 'Total']
+
+
+def scenario_inputs(NRE_summary, kit_summary):
+    """Return the Budget and Actual Revenues of every scenario category of the wip_summaries."""
+    rows = pd.concat([NRE_summary.loc[_NRE_ROWS, ['Budget', 'Actual Revenues']],
+                      kit_summary.loc[_KIT_ROWS, ['Budget', 'Actual Revenues']]])
+    return pd.DataFrame(rows.to_numpy(dtype=np.float64), index=pd.Index(SCENARIO_CATEGORIES, name='Category'),
+                        columns=['Budget', 'Actual Revenues'])
+
+
+def kit_grid(low, high, points):
+    """Return at most points kit counts spread evenly from low to high."""
+    return np.unique(np.linspace(low, high, max(2, points)).round().astype(np.int64))
+
+
+def sensitivity(inputs, kits, months):
+    """Return {measure: frame} of every scenario, indexed by (Category, Kits) with one column per forecast month.
+
+    After m months at the actuals per kit each month, the projected actuals of a category
+    are actuals * (1 + m / kits); Remaining on Budget is those minus the budget, as in
+    the summaries, and Cost per Kit is those divided by the number of kits. Grids of more
+    than MAX_SCENARIO_CELLS cells are rejected.
+    """
+    kits = np.asarray(kits, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    if (kits < 1).any():
+        raise ValueError('the number of kits must be at least 1')
+    cells = len(inputs) * len(kits) * len(months)
+    if cells > MAX_SCENARIO_CELLS:
+        raise ValueError(f'{cells} scenario cells requested, at most {MAX_SCENARIO_CELLS} are evaluated')
+    actuals = inputs['Actual Revenues'].to_numpy()[:, None, None]
+    budget = inputs['Budget'].to_numpy()[:, None, None]
+    per_kit = 1.0 / kits[None, :, None]
+
+    projected = actuals * (1.0 + months[None, None, :] * per_kit)
+    grids = {'Remaining on Budget': projected - budget, 'Cost per Kit': projected * per_kit}
+
+    index = pd.MultiIndex.from_product([inputs.index, kits], names=['Category', 'Kits'])
+    columns = pd.Index(months, name='Months')
+    return {measure: pd.DataFrame(grid.reshape(len(index), len(columns)), index=index, columns=columns)
+            for measure, grid in grids.items()}
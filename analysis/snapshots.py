@@ -0,0 +1,237 @@
+"""Monthly workbook snapshots kept in the local store.
+
+Every ingested workbook becomes a named snapshot holding its Revenue Actuals amounts
+(one row per project, category, sheet row and month, blanks left out) and the
+classified budget lines of every project sheet. A sheet whose content hash matches the
+latest stored version is not stored again: the new snapshot points to the rows of the
+snapshot that already holds them, and a workbook identical to an ingested one is skipped.
+Deltas between two snapshots are aggregated in SQL, without reading any Excel file.
+
+    python -m analysis.snapshots ingest workbook.xlsx --name 2024-05
+    python -m analysis.snapshots list
+    python -m analysis.snapshots delta 2024-04 2024-05 -o delta.csv
+"""
+import argparse
+import hashlib
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from analysis.budget import budget_totals, read_budget_lines
+from analysis.ledger import month_periods, period_dates, read_ledger
+from analysis.portfolio import portfolio_projects
+from analysis.revenue import REVENUE_SHEET
+from analysis.store import transaction
+from analysis.workbook import file_digest, read_sheet
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    digest TEXT NOT NULL,
+    as_of INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_sheets (
+    snapshot INTEGER NOT NULL REFERENCES snapshots (id),
+    sheet TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    source INTEGER NOT NULL REFERENCES snapshots (id),
+    PRIMARY KEY (snapshot, sheet)
+);
+CREATE TABLE IF NOT EXISTS snapshot_actuals (
+    source INTEGER NOT NULL REFERENCES snapshots (id),
+    project,
+    category,
+    line INTEGER NOT NULL,
+    period INTEGER NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshot_actuals_source ON snapshot_actuals (source, project, category);
+CREATE TABLE IF NOT EXISTS snapshot_budget_lines (
+    source INTEGER NOT NULL REFERENCES snapshots (id),
+    sheet TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    scheme TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshot_budget_lines_source ON snapshot_budget_lines (source, sheet);
+'''
+
+SHEET_COLUMNS = ['Sheet', 'Digest', 'Stored']
+
+
+def frame_digest(frame):
+    """Content hash of a parsed sheet: its values, index and column labels."""
+    hashed = pd.util.hash_pandas_object(frame.reset_index(), index=False).to_numpy()
+    return hashlib.sha256(hashed.tobytes() + repr(list(frame.columns)).encode()).hexdigest()
+
+
+def ingest(source, name=None, as_of=None, path=None):
+    """Store a workbook as a new snapshot and return one row per sheet, with Stored False where it was unchanged.
+
+    name defaults to the as_of month, as_of (the first month counted as forecast rather
+    than actuals) to the current month.
+    """
+    as_of = pd.Timestamp(as_of or pd.Timestamp.now()).replace(day=1).normalize()
+    name = name or as_of.strftime('%Y-%m')
+    digest = file_digest(source)
+
+    def exists(conn):
+        if conn.execute('SELECT 1 FROM snapshots WHERE digest = ?', (digest,)).fetchone():
+            return True
+        if conn.execute('SELECT 1 FROM snapshots WHERE name = ?', (name,)).fetchone():
+            raise ValueError(f'snapshot {name!r} already exists')
+        return False
+
+    with transaction(path, SCHEMA) as conn:
+        if exists(conn):
+            return pd.DataFrame(columns=SHEET_COLUMNS)
+
+    # parse and hash every sheet before writing, so the store is only locked for the inserts
+    ledger = read_ledger(source)
+    parsed = [(REVENUE_SHEET, frame_digest(ledger), lambda conn, snapshot: _insert_actuals(conn, snapshot, ledger))]
+    for project in portfolio_projects(source):
+        budget_lines = read_budget_lines(source, project)
+        parsed.append((str(project), frame_digest(read_sheet(source, project)),
+                       lambda conn, snapshot, sheet=str(project), lines=budget_lines: _insert_budget_lines(conn, snapshot, sheet, lines)))
+
+    with transaction(path, SCHEMA) as conn:
+        # stored by another session while this one was parsing
+        if exists(conn):
+            return pd.DataFrame(columns=SHEET_COLUMNS)
+        snapshot = conn.execute('INSERT INTO snapshots (name, digest, as_of, ingested_at) VALUES (?, ?, ?, ?)',
+                                (name, digest, int(month_periods([as_of])[0]), datetime.now().isoformat(timespec='seconds'))).lastrowid
+        sheets = [_store_sheet(conn, snapshot, sheet, sheet_digest, lambda: insert(conn, snapshot)) for sheet, sheet_digest, insert in parsed]
+    return pd.DataFrame(sheets, columns=SHEET_COLUMNS)
+
+
+def _store_sheet(conn, snapshot, sheet, digest, insert):
+    latest = conn.execute('SELECT digest, source FROM snapshot_sheets WHERE sheet = ? AND snapshot < ? ORDER BY snapshot DESC LIMIT 1',
+                          (sheet, snapshot)).fetchone()
+    unchanged = latest is not None and latest[0] == digest
+    if not unchanged:
+        insert()
+    conn.execute('INSERT INTO snapshot_sheets (snapshot, sheet, digest, source) VALUES (?, ?, ?, ?)',
+                 (snapshot, sheet, digest, latest[1] if unchanged else snapshot))
+    return sheet, digest, not unchanged
+
+
+def _insert_actuals(conn, snapshot, ledger):
+    amounts = ledger.to_numpy()
+    lines, months = np.nonzero(~np.isnan(amounts))
+    projects = np.asarray(ledger.index.get_level_values('Project #'), dtype=object)
+    categories = np.asarray(ledger.index.get_level_values('Category'), dtype=object)
+    periods = ledger.columns.to_numpy()
+    conn.executemany('INSERT INTO snapshot_actuals VALUES (?, ?, ?, ?, ?, ?)',
+                     zip([snapshot] * len(lines), projects[lines].tolist(), categories[lines].tolist(), lines.tolist(),
+                         periods[months].tolist(), amounts[lines, months].tolist()))
+
+
+def _insert_budget_lines(conn, snapshot, sheet, budget_lines):
+    conn.executemany('INSERT INTO snapshot_budget_lines VALUES (?, ?, ?, ?, ?, ?)',
+                     ((snapshot, sheet, row, scheme, category, amount) for row, scheme, category, amount
+                      in zip(budget_lines['Row'].tolist(), budget_lines['Scheme'], budget_lines['Category'], budget_lines['Amount'].tolist())))
+
+
+def list_snapshots(path=None):
+    """Return the stored snapshots, oldest first."""
+    with transaction(path, SCHEMA) as conn:
+        snapshots = pd.read_sql_query('SELECT name AS Name, as_of AS "As Of", ingested_at AS Ingested, digest AS Digest FROM snapshots ORDER BY id', conn)
+    snapshots['As Of'] = period_dates(snapshots['As Of'].to_numpy(dtype=np.int32))
+    return snapshots
+
+
+def _source(conn, name, sheet):
+    row = conn.execute('SELECT ss.source FROM snapshot_sheets ss JOIN snapshots s ON s.id = ss.snapshot WHERE s.name = ? AND ss.sheet = ?',
+                       (name, sheet)).fetchone()
+    return row[0] if row else None
+
+
+def snapshot_totals(name, path=None):
+    """Return the actuals (months before the snapshot's as_of month) and forecast of every project and category."""
+    with transaction(path, SCHEMA) as conn:
+        as_of = conn.execute('SELECT as_of FROM snapshots WHERE name = ?', (name,)).fetchone()
+        if as_of is None:
+            raise KeyError(f'no snapshot named {name!r}')
+        totals = pd.read_sql_query(
+            'SELECT project AS "Project #", category AS Category,'
+            ' SUM(CASE WHEN period < :as_of THEN amount ELSE 0 END) AS Actuals,'
+            ' SUM(CASE WHEN period >= :as_of THEN amount ELSE 0 END) AS Forecast'
+            ' FROM snapshot_actuals WHERE source = :source GROUP BY project, category',
+            conn, params={'as_of': as_of[0], 'source': _source(conn, name, REVENUE_SHEET)})
+    return totals.set_index(['Project #', 'Category'])
+
+
+def snapshot_budget_lines(name, sheet, path=None):
+    """Return the classified budget lines of a project sheet in a snapshot, as read_budget_lines does."""
+    with transaction(path, SCHEMA) as conn:
+        return pd.read_sql_query('SELECT row AS Row, scheme AS Scheme, category AS Category, amount AS Amount'
+                                 ' FROM snapshot_budget_lines WHERE source = ? AND sheet = ? ORDER BY rowid',
+                                 conn, params=(_source(conn, name, str(sheet)), str(sheet)))
+
+
+def snapshot_budgets(name, path=None):
+    """Return the budget of every Flags category of every project sheet in a snapshot."""
+    with transaction(path, SCHEMA) as conn:
+        lines = pd.read_sql_query('SELECT ss.sheet AS Sheet, l.row AS Row, l.scheme AS Scheme, l.category AS Category, l.amount AS Amount'
+                                  ' FROM snapshot_sheets ss JOIN snapshots s ON s.id = ss.snapshot'
+                                  ' JOIN snapshot_budget_lines l ON l.source = ss.source AND l.sheet = ss.sheet'
+                                  ' WHERE s.name = ? ORDER BY l.rowid', conn, params=(name,))
+    budgets = {sheet: budget_totals(sheet_lines) for sheet, sheet_lines in lines.groupby('Sheet', sort=False)}
+    if not budgets:
+        return pd.Series(dtype=np.float64, name='Budget', index=pd.MultiIndex.from_tuples([], names=['Project #', 'Category']))
+    return pd.concat(budgets, names=['Project #', 'Category']).rename('Budget')
+
+
+def snapshot_delta(base, compare, projects=None, path=None):
+    """Return actuals, forecast and budget of two snapshots side by side with their change, per project and category."""
+    totals = {name: snapshot_totals(name, path) for name in (base, compare)}
+    budgets = {name: snapshot_budgets(name, path) for name in (base, compare)}
+    parts = []
+    for measure, old, new in (('Actuals', totals[base]['Actuals'], totals[compare]['Actuals']),
+                              ('Forecast', totals[base]['Forecast'], totals[compare]['Forecast']),
+                              ('Budget', budgets[base], budgets[compare])):
+        both = pd.concat({f'{measure} {base}': old, f'{measure} {compare}': new}, axis=1)
+        both[f'{measure} change'] = both.iloc[:, 1].fillna(0.0) - both.iloc[:, 0].fillna(0.0)
+        parts.append(both)
+    delta = pd.concat(parts, axis=1).sort_index()
+    if projects is not None:
+        delta = delta[delta.index.get_level_values('Project #').isin(projects)]
+    return delta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Store monthly workbook snapshots and compare them.')
+    parser.add_argument('--store', help='SQLite file of the store (default: ANALYSIS_STORE or analysis_store.sqlite)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help='store a workbook as a new snapshot')
+    ingest_parser.add_argument('workbook')
+    ingest_parser.add_argument('--name', help='snapshot name (default: the as-of month, YYYY-MM)')
+    ingest_parser.add_argument('--as-of', help='first forecast month (default: the current month)')
+    commands.add_parser('list', help='list the stored snapshots')
+    delta_parser = commands.add_parser('delta', help='compare two snapshots')
+    delta_parser.add_argument('base')
+    delta_parser.add_argument('compare')
+    delta_parser.add_argument('-o', '--output', help='CSV file to write (default: print)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'ingest':
+        sheets = ingest(args.workbook, args.name, args.as_of, args.store)
+        if sheets.empty:
+            print(f'{os.path.basename(args.workbook)} is already stored')
+        else:
+            print(f'{int(sheets["Stored"].sum())} sheets stored, {int((~sheets["Stored"]).sum())} unchanged')
+    elif args.command == 'list':
+        print(list_snapshots(args.store).to_string(index=False))
+    elif args.output:
+        snapshot_delta(args.base, args.compare, path=args.store).to_csv(args.output)
+    else:
+        print(snapshot_delta(args.base, args.compare, path=args.store).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Local SQLite store shared by the snapshot history and the project entries.
+
+The store is a single SQLite file, ANALYSIS_STORE or analysis_store.sqlite in the
+working directory. Each module that keeps data in it passes its own CREATE ... IF NOT
+EXISTS schema to transaction, which creates the tables once per store file. Every thread
+reuses one connection per store file.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+STORE_PATH = os.environ.get('ANALYSIS_STORE', 'analysis_store.sqlite')
+
+_local = threading.local()
+# (store file, schema) pairs whose tables exist
+_created = set()
+_created_lock = threading.Lock()
+
+
+def store_path(path=None):
+    return os.path.abspath(path or STORE_PATH)
+
+
+def store_signature(path=None):
+    """(modification time, size) of the store file, None while it does not exist."""
+    try:
+        stat = os.stat(store_path(path))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def connect(path=None, schema=None):
+    """Open a new connection to the store, creating the tables of schema if they do not exist yet."""
+    conn = sqlite3.connect(store_path(path))
+    conn.execute('PRAGMA foreign_keys = ON')
+    if schema:
+        conn.executescript(schema)
+    return conn
+
+
+def _connection(path, schema):
+    path = store_path(path)
+    connections = _local.__dict__.setdefault('connections', {})
+    conn = connections.get(path)
+    if conn is not None and not os.path.exists(path):
+        # the file was removed under an open connection, start over
+        conn.close()
+        conn = None
+        with _created_lock:
+            _created.difference_update({key for key in _created if key[0] == path})
+    if conn is None:
+        conn = connections[path] = connect(path)
+    if schema:
+        with _created_lock:
+            created = (path, schema) in _created
+        if not created:
+            conn.executescript(schema)
+            with _created_lock:
+                _created.add((path, schema))
+    return conn
+
+
+@contextmanager
+def transaction(path=None, schema=None):
+    """The thread's connection to the store, committing on success and rolling back on error."""
+    conn = _connection(path, schema)
+    with conn:
+        yield conn
@@ -0,0 +1,67 @@
+"""Streaming reader for the 'Revenue Actuals ' sheet.
+
+The sheet is read row by row from a read-only openpyxl worksheet. Rows of unselected
+projects are dropped as they stream past and only the selected month columns are kept,
+so memory and conversion time follow the selection rather than the size of the sheet.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis.revenue import DATE_FORMAT, FIRST_MONTH_COLUMN, REVENUE_SKIPROWS, clean_amounts
+
+
+def _meta_value(value):
+    # same conversions as pd.read_excel: blanks are NaN, integral floats are ints
+    if value is None:
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def stream_revenue_actuals(worksheet, projects=None, start=None, end=None, months=True, skiprows=REVENUE_SKIPROWS):
+    """Return the Revenue Actuals rows of the selected projects and months.
+
+    projects limits the rows to those Project # values, start and end (inclusive) limit
+    the month columns, and months=False keeps only the six descriptive columns. The frame
+    has the same column layout as pd.read_excel(..., skiprows=33): descriptive columns,
+    month columns, then 'Total Activity', with all amounts parsed to float64.
+    """
+    rows = worksheet.iter_rows(min_row=skiprows + 1, values_only=True)
+    header = list(next(rows, ()))
+    while header and header[-1] is None:
+        header.pop()
+    labels = [f'Unnamed: {i}' if label is None else label for i, label in enumerate(header)]
+    width = len(labels)
+    project_column = labels.index('Project #')
+
+    month_positions = np.arange(FIRST_MONTH_COLUMN, width - 1)
+    if months:
+        dates = pd.to_datetime(pd.Index(labels[FIRST_MONTH_COLUMN:-1], dtype=object), format=DATE_FORMAT)
+        in_range = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            in_range &= dates >= pd.Timestamp(start)
+        if end is not None:
+            in_range &= dates <= pd.Timestamp(end)
+        keep = list(range(FIRST_MONTH_COLUMN)) + month_positions[in_range].tolist() + [width - 1]
+    else:
+        keep = list(range(FIRST_MONTH_COLUMN))
+
+    selected = None if projects is None else set(projects)
+    picked = []
+    for row in rows:
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        if selected is None:
+            if all(value is None for value in row):
+                continue
+        elif _meta_value(row[project_column]) not in selected:
+            continue
+        picked.append([row[i] for i in keep])
+
+    cells = np.array(picked, dtype=object).reshape(len(picked), len(keep))
+    meta = pd.DataFrame({labels[i]: [_meta_value(v) for v in cells[:, i]] for i in range(FIRST_MONTH_COLUMN)})
+    if not months:
+        return meta
+    amounts = pd.DataFrame(clean_amounts(cells[:, FIRST_MONTH_COLUMN:]), columns=[labels[i] for i in keep[FIRST_MONTH_COLUMN:]])
+    return pd.concat([meta, amounts], axis=1)
@@ -0,0 +1,91 @@
+"""Synthetic workbooks with the layout the dashboard pages expect.
+
+The 'Revenue Actuals ' sheet has 33 preamble rows, then a header of six descriptive
+columns ('Project #' and 'Category' among them), one column per month and
+'Total Activity'. Every project gets a budget sheet named after its Project # with the
+'NRE ', 'CR' and 'AVG cost based on Qty' columns read by the Flags and WIP pages.
+
+    python -m analysis.synthetic workbook.xlsx --projects 50 --months 60 --categories 10
+"""
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from analysis.flags import FLAG_CATEGORIES
+from analysis.revenue import REVENUE_SHEET, REVENUE_SKIPROWS
+
+DESCRIPTIVE_COLUMNS = ['Company', 'Business Unit', 'Program', 'Project #', 'Project Name', 'Category']
+BUDGET_COLUMNS = ['Description', 'Qty', 'Unit', 'Rate', 'NRE ', 'AVG cost based on Qty', 'CR']
+REVENUE_CATEGORIES = ['Milestones', 'Kit Sales']
+
+
+def _accounting(value):
+    # negative amounts exported as text, e.g. '(1,234)'
+    return f'({abs(value):,.0f})' if value < 0 else f'{value:,.0f}'
+
+
+def generate_workbook(path, projects=10, months=36, categories=len(FLAG_CATEGORIES), start=datetime(2023, 1, 1),
+                      text_amounts=0.0, seed=0):
+    """Write a synthetic workbook to path and return the list of Project # values.
+
+    categories beyond the eight standard Flags categories are added as 'Other Cost N'.
+    text_amounts is the share of month cells written as accounting text instead of numbers.
+    """
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    category_names = FLAG_CATEGORIES[:categories] + [f'Other Cost {i + 1}' for i in range(categories - len(FLAG_CATEGORIES))]
+    month_headers = [datetime(start.year + (start.month - 1 + m) // 12, (start.month - 1 + m) % 12 + 1, 1) for m in range(months)]
+    project_ids = [f'P{10000 + i}' for i in range(projects)]
+
+    workbook = Workbook(write_only=True)
+    revenue = workbook.create_sheet(REVENUE_SHEET)
+    for i in range(REVENUE_SKIPROWS):
+        revenue.append([f'Revenue report preamble line {i + 1}'] if i < 3 else [])
+    revenue.append(DESCRIPTIVE_COLUMNS + month_headers + ['Total Activity'])
+
+    for project in project_ids:
+        scale = rng.uniform(5_000, 60_000)
+        for category in category_names:
+            amounts = np.round(rng.gamma(2.0, scale / 2.0, months), 2)
+            if category in REVENUE_CATEGORIES:
+                amounts = -amounts
+            cells = [_accounting(a) if rng.random() < text_amounts else float(a) for a in amounts]
+            revenue.append(['Company', 'Aerospace', f'Program {project[-2:]}', project, f'Project {project}', category]
+                           + cells + [float(amounts.sum())])
+
+    for project in project_ids:
+        kits = int(rng.integers(5, 60))
+        hours = float(rng.integers(500, 5000))
+        rate = float(rng.uniform(80, 160))
+        budget = workbook.create_sheet(project)
+        budget.append(BUDGET_COLUMNS)
+        budget.append(['NRE', None, 'Lot', None, float(rng.uniform(1e5, 5e5)), None, float(rng.uniform(0, 2e4))])
+        budget.append(['Engineering Labor', hours, 'Hour', rate, hours * rate, None, 0.0])
+        budget.append(['Other NRE Costs', 1, 'Lot', None, float(rng.uniform(1e4, 1e5)), None, 0.0])
+        budget.append(['TRAVEL ', 1, 'Lot', None, float(rng.uniform(5e3, 5e4)), None, 0.0])
+        budget.append(['Kit', kits, 'EA', None, float(rng.uniform(2e5, 8e5)), kits, float(rng.uniform(0, 1e4))])
+        budget.append(['Kit Manufacturing Labor', hours / 2, 'Hour', rate, hours / 2 * rate, None, 0.0])
+        budget.append(['Kit Material Receipts', kits, 'EA', None, float(rng.uniform(1e5, 6e5)), 'AVG cost based on Qty', 0.0])
+
+    workbook.save(path)
+    return project_ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic workbook in the layout of the dashboard input.')
+    parser.add_argument('output', help='path of the .xlsx file to write')
+    parser.add_argument('--projects', type=int, default=10)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--categories', type=int, default=len(FLAG_CATEGORIES))
+    parser.add_argument('--text-amounts', type=float, default=0.0, help='share of month cells written as accounting text')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generate_workbook(args.output, args.projects, args.months, args.categories, text_amounts=args.text_amounts, seed=args.seed)
+    print(f'{args.projects} projects x {args.months} months x {args.categories} categories written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
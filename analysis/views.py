@@ -0,0 +1,72 @@
+"""Memoized views of the Revenues page.
+
+The long Date/Amount/Project/Category frame of a (workbook, projects, categories)
+selection is built once and kept in the workbook cache, which evicts the least recently
+used entries. The cumulative view, the pivot and the CSV download are derived from it
+and cached as well, so toggling 'Cumulative View' or changing the number of kits only
+pays for the step that actually changes: the Number of Kits row is added to the cached
+pivot on every run.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis.ledger import ledger_long, read_ledger
+from analysis.revenue import REVENUE_SHEET
+from analysis.rollup import cube_long, read_cube
+from analysis.workbook import cache, file_digest, read_revenue_actuals
+
+
+def _key(source, projects, categories, view):
+    # prepare_dataframe drops the months after today, so the views expire with the day
+    return (file_digest(source), REVENUE_SHEET, (view, tuple(projects), tuple(categories), pd.Timestamp.now().normalize()))
+
+
+def revenue_long(source, projects, categories, cumulative=False, granularity='Month'):
+    """Return the prepare_dataframe frame of the selection, per period or cumulative.
+
+    Months are read from the ledger, coarser granularities from the rollup cube, with
+    Date the first day of each period. The returned frame is shared between reruns and
+    must not be modified in place.
+    """
+    if cumulative:
+        return cache.get_or_load(_key(source, projects, categories, ('cumulative', granularity)),
+                                 lambda: cumulative_view(revenue_long(source, projects, categories, granularity=granularity)))
+    if granularity == 'Month':
+        return cache.get_or_load(_key(source, projects, categories, 'long'),
+                                 lambda: ledger_long(read_ledger(source), projects, categories))
+    return cache.get_or_load(_key(source, projects, categories, ('long', granularity)),
+                             lambda: cube_long(read_cube(source, granularity), projects, categories))
+
+
+def cumulative_view(plot_df):
+    """Running total of every project/category line of a prepare_dataframe frame.
+
+    The months dropped by prepare_dataframe are the last ones, so the running total of the
+    kept periods is the same as when it is taken before the cutoff.
+    """
+    n_dates = plot_df['Date'].nunique()
+    amounts = plot_df['Amount'].to_numpy()
+    return plot_df.assign(Amount=np.cumsum(amounts.reshape(-1, n_dates), axis=1).ravel() if n_dates else amounts)
+
+
+def revenue_pivot(source, projects, categories, cumulative=False, granularity='Month'):
+    """Return the selection pivoted to one row per (Project, Category) and one column per period."""
+    return cache.get_or_load(_key(source, projects, categories, ('pivot', cumulative, granularity)), lambda: revenue_long(
+        source, projects, categories, cumulative, granularity).pivot(index=['Project', 'Category'], columns='Date', values='Amount'))
+
+
+def with_number_of_kits(plot_wide, number_of_kits):
+    """Add the Number of Kits row below the last project and label the last column 'Total Activity'."""
+    kits_row = pd.DataFrame([[0] * (len(plot_wide.columns) - 1) + [number_of_kits]], columns=plot_wide.columns,
+                            index=pd.MultiIndex.from_tuples([(plot_wide.index[-1][0], 'Number of Kits')], names=plot_wide.index.names))
+    plot_wide = pd.concat([plot_wide, kits_row])
+    return plot_wide.rename(columns={plot_wide.columns[-1]: 'Total Activity'})
+
+
+def revenue_csv(source, projects, categories):
+    """Return the Revenue Actuals rows of the selection as CSV bytes for the download button."""
+    def to_csv():
+        df = read_revenue_actuals(source, projects=projects)
+        return df[df['Project #'].isin(projects) & df['Category'].isin(categories)].to_csv().encode('utf-8')
+
+    return cache.get_or_load(_key(source, projects, categories, 'csv'), to_csv)
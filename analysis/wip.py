@@ -0,0 +1,256 @@
+"""WIP summaries and the dynamic forecast of a project."""
+import re
+
+import numpy as np
+import pandas as pd
+
+from analysis.projects import project_budget_lines, saved_projects
+from analysis.revenue import DATE_FORMAT, clean_amounts, month_columns
+from analysis.workbook import read_revenue_actuals, sheet_names
+
+NRE_CATEGORIES = 'Engineering Labor|Other NRE|TRAVEL'
+KIT_CATEGORIES = 'Manufacturing Labor|Material Receipts'
+# forecast horizon when the page does not set one
+MAX_FORECAST_MONTHS = 120
+
+
+def process_revenue_actuals(revenue_actuals, projects):
+    """Return the rows of the given projects with their Total_Actuals and Total_Forcast.
+
+    Actuals are the months before the current one, the forecast is the current month onwards.
+    """
+    revenue_actuals = revenue_actuals[revenue_actuals['Project #'].isin(projects)].copy()
+    current_month = pd.Timestamp.now().normalize().replace(day=1)
+    dates = pd.to_datetime(month_columns(revenue_actuals), format=DATE_FORMAT)
+    amounts = clean_amounts(revenue_actuals[month_columns(revenue_actuals)].to_numpy())
+    past = dates < current_month
+    revenue_actuals['Total_Actuals'] = np.nansum(amounts[:, past], axis=1)
+    revenue_actuals['Total_Forcast'] = np.nansum(amounts[:, ~past], axis=1)
+    return revenue_actuals
+
+
+def category_map(revenue_categories, wip_categories):
+    """Return the (Category, WIP Category) pairs of revenue categories whose name contains a WIP category."""
+    patterns = [(wip_category, re.compile(wip_category, re.IGNORECASE)) for wip_category in wip_categories]
+    pairs = [(category, wip_category) for category in pd.unique(revenue_categories) if isinstance(category, str)
+             for wip_category, pattern in patterns if pattern.search(category)]
+    return pd.DataFrame(pairs, columns=['Category', 'WIP Category'])
+
+
+def summarize_wip(budget_lines, revenue_actuals, category):
+    """Summarize Budget, Actual Revenues and Forcast of several projects in one groupby.
+
+    budget_lines maps each Project # to its classified budget lines and revenue_actuals is the
+    process_revenue_actuals output for those projects. Returns the summaries of all projects
+    stacked on a (Project, Category) index, each followed by its 'Total' row.
+    """
+    categories = category.split('|')
+    projects = list(budget_lines)
+    columns = ['Budget', 'Actual Revenues', 'Forcast', 'Remaining on Budget']
+    if not projects:
+        return pd.DataFrame(columns=columns, dtype=np.float64, index=pd.MultiIndex.from_tuples([], names=['Project', 'Category']))
+
+    budgets = [lines.loc[(lines['Scheme'] == 'wip') & lines['Category'].isin(categories), ['Category', 'Amount']].assign(Project=project)
+               for project, lines in budget_lines.items()]
+    budget = pd.concat(budgets, ignore_index=True).rename(columns={'Amount': 'Budget'})
+
+    mapping = category_map(revenue_actuals['Category'], categories)
+    actuals = (revenue_actuals[['Project #', 'Category', 'Total_Actuals', 'Total_Forcast']]
+               .merge(mapping, on='Category')
+               .drop(columns='Category')
+               .rename(columns={'Project #': 'Project', 'WIP Category': 'Category', 'Total_Actuals': 'Actual Revenues', 'Total_Forcast': 'Forcast'}))
+
+    index = pd.MultiIndex.from_product([projects, categories], names=['Project', 'Category'])
+    summary = (pd.concat([budget, actuals], ignore_index=True)
+               .groupby(['Project', 'Category'])[['Budget', 'Actual Revenues', 'Forcast']].sum()
+               .reindex(index, fill_value=0.0))
+    summary['Remaining on Budget'] = summary['Actual Revenues'] - summary['Budget']
+
+    totals = summary.groupby(level='Project', sort=False).sum()
+    totals.index = pd.MultiIndex.from_product([totals.index, ['Total']], names=['Project', 'Category'])
+    order = pd.MultiIndex.from_tuples([(p, c) for p in projects for c in categories + ['Total']], names=['Project', 'Category'])
+    return pd.concat([summary, totals]).reindex(order)
+
+
+def summarize_budget(budget_lines, revenue_actuals, category):
+    """Summarize budget for NRE or Kits of a single project."""
+    project = 'project'
+    summary = summarize_wip({project: budget_lines}, revenue_actuals.assign(**{'Project #': project}), category).loc[project]
+    summary.index.name = None
+    # the page appends blank separator rows to the summaries
+    return summary.astype(object)
+
+
+def compare_wip(source, projects):
+    """Return the stacked NRE and Kit summaries of every project that has a budget sheet or a saved budget.
+
+    Projects without either are left out, so the summaries are empty when none has one.
+    """
+    names = set(sheet_names(source)) | set(saved_projects())
+    projects = [p for p in projects if p in names]
+    budget_lines = {p: project_budget_lines(source, p) for p in projects}
+    revenue_actuals = process_revenue_actuals(read_revenue_actuals(source, projects=projects), projects)
+    return summarize_wip(budget_lines, revenue_actuals, NRE_CATEGORIES), summarize_wip(budget_lines, revenue_actuals, KIT_CATEGORIES)
+
+
+def wip_summaries(budget_lines, revenue_actuals, number_of_kits):
+    """Return the NRE summary, the Kit summary and the Kit summary adjusted for display.
+
+    revenue_actuals is the output of process_revenue_actuals for the project.
+    """
+    NRE_summary = summarize_budget(budget_lines, revenue_actuals, NRE_CATEGORIES)
+    kit_summary = summarize_budget(budget_lines, revenue_actuals, KIT_CATEGORIES)
+
+    # Additional calculations for NRE Summary
+    NRE_summary.loc[' '] = ''
+    NRE_summary.loc['Average Engineering Labor'] = 0
+    NRE_summary.loc['Average Engineering Labor', 'Actual Revenues'] = NRE_summary.loc['Engineering Labor', 'Actual Revenues'] / number_of_kits
+    NRE_summary.loc['Average Engineering Labor', 'Forcast'] = NRE_summary.loc['Engineering Labor', 'Forcast'] / number_of_kits
+    NRE_summary.loc['Average Engineering Labor', 'Budget'] = NRE_summary.loc['Engineering Labor', 'Budget'] / number_of_kits
+    NRE_summary.loc['Average Other NRE'] = 0
+    NRE_summary.loc['Average Other NRE', 'Actual Revenues'] = NRE_summary.loc['Other NRE', 'Actual Revenues'] / number_of_kits
+    NRE_summary.loc['Average Other NRE', 'Forcast'] = NRE_summary.loc['Other NRE', 'Forcast'] / number_of_kits
+    NRE_summary.loc['Average Other NRE', 'Budget'] = NRE_summary.loc['Other NRE', 'Budget'] / number_of_kits
+    NRE_summary.loc['Average TRAVEL'] = 0
+    NRE_summary.loc['Average TRAVEL', 'Actual Revenues'] = NRE_summary.loc['TRAVEL', 'Actual Revenues'] / number_of_kits
+    NRE_summary.loc['Average TRAVEL', 'Forcast'] = NRE_summary.loc['TRAVEL', 'Forcast'] / number_of_kits
+    NRE_summary.loc['Average TRAVEL', 'Budget'] = NRE_summary.loc['TRAVEL', 'Budget'] / number_of_kits
+    NRE_summary.loc['Average Total'] = 0
+    NRE_summary.loc['Average Total', 'Actual Revenues'] = NRE_summary.loc['Total', 'Actual Revenues'] / number_of_kits
+    NRE_summary.loc['Average Total', 'Forcast'] = NRE_summary.loc['Total', 'Forcast'] / number_of_kits
+    NRE_summary.loc['Average Total', 'Budget'] = NRE_summary.loc['Total', 'Budget'] / number_of_kits
+    NRE_summary.loc['  '] = ''
+    NRE_summary.loc['Milestones'] = 0
+    NRE_summary.loc['Milestones', 'Actual Revenues'] = revenue_actuals[revenue_actuals['Category'] == 'Milestones']['Total_Actuals'].sum()
+    NRE_summary.loc['Milestones', 'Forcast'] = revenue_actuals[revenue_actuals['Category'] == 'Milestones']['Total_Forcast'].sum()
+    NRE_summary.loc['Cost Vs Billed', 'Actual Revenues'] = NRE_summary.loc['Total', 'Actual Revenues'] + NRE_summary.loc['Milestones', 'Actual Revenues']
+    NRE_summary.loc['Cost Vs Billed', 'Forcast'] = NRE_summary.loc['Total', 'Forcast'] + NRE_summary.loc['Milestones', 'Forcast']
+
+    # Additional calculations for Kit Summary
+    kit_summary.loc[' '] = ''
+    kit_summary.loc['Average Manufacturing Labor'] = 0
+    kit_summary.loc['Average Manufacturing Labor', 'Actual Revenues'] = kit_summary.loc['Manufacturing Labor', 'Actual Revenues'] / number_of_kits
+    kit_summary.loc['Average Manufacturing Labor', 'Forcast'] = kit_summary.loc['Manufacturing Labor', 'Forcast'] / number_of_kits
+    kit_summary.loc['Average Manufacturing Labor', 'Budget'] = kit_summary.loc['Manufacturing Labor', 'Budget'] / number_of_kits
+
+    kit_summary.loc['Average Material Receipts'] = 0
+    kit_summary.loc['Average Material Receipts', 'Actual Revenues'] = kit_summary.loc['Material Receipts', 'Actual Revenues'] / number_of_kits
+    kit_summary.loc['Average Material Receipts', 'Forcast'] = kit_summary.loc['Material Receipts', 'Forcast'] / number_of_kits
+    kit_summary.loc['Average Material Receipts', 'Budget'] = kit_summary.loc['Material Receipts', 'Budget'] / number_of_kits
+
+    kit_summary.loc['Average Total'] = 0
+    kit_summary.loc['Average Total', 'Actual Revenues'] = kit_summary.loc['Total', 'Actual Revenues'] / number_of_kits
+    kit_summary.loc['Average Total', 'Forcast'] = kit_summary.loc['Total', 'Forcast'] / number_of_kits
+    kit_summary.loc['Average Total', 'Budget'] = kit_summary.loc['Total', 'Budget'] / number_of_kits
+
+    kit_summary.loc['  '] = ''
+    kit_summary.loc['Kit Sales'] = 0
+    kit_summary.loc['Kit Sales', 'Actual Revenues'] = revenue_actuals[revenue_actuals['Category'] == 'Kit Sales']['Total_Actuals'].sum()
+    kit_summary.loc['Kit Sales', 'Forcast'] = revenue_actuals[revenue_actuals['Category'] == 'Kit Sales']['Total_Forcast'].sum()
+
+    # for each numerical cell, round
+    NRE_summary = NRE_summary.applymap(lambda x: round(x, 2) if isinstance(x, (int, float)) else x)
+    kit_summary = kit_summary.applymap(lambda x: round(x, 2) if isinstance(x, (int, float)) else x)
+    kit_summary_adjusted = kit_summary.copy()
+    kit_summary_adjusted.loc['Manufacturing Labor', 'Remaining on Budget'] = kit_summary_adjusted.loc['Manufacturing Labor', 'Remaining on Budget'] - kit_summary_adjusted.loc['Total', 'Remaining on Budget']
+    kit_summary_adjusted.loc['Total', 'Remaining on Budget'] = kit_summary_adjusted.loc['Total', 'Remaining on Budget'] - kit_summary_adjusted.loc['Total', 'Remaining on Budget']
+
+    return NRE_summary, kit_summary, kit_summary_adjusted
+
+
+def burn_down(start, step, months, horizon):
+    """Return the month by month burn-down matrix of several rows in one array operation.
+
+    Row r holds start[r] + step[r] * i for months i = 1 .. months[r] and NaN after that.
+    The matrix is horizon months wide.
+    """
+    i = np.arange(1, horizon + 1)
+    values = np.asarray(start, dtype=np.float64)[:, None] + np.asarray(step, dtype=np.float64)[:, None] * i
+    values[i > np.asarray(months)[:, None]] = np.nan
+    return values
+
+
+def months_to_recover(overrun, monthly_rate, horizon=None):
+    """Number of months of monthly_rate needed to cover each overrun, capped at horizon when given.
+
+    Rows without an overrun or without a positive monthly rate get no forecast months.
+    """
+    overrun = np.asarray(overrun, dtype=np.float64)
+    monthly_rate = np.asarray(monthly_rate, dtype=np.float64)
+    valid = (overrun > 0) & (monthly_rate > 0) & np.isfinite(overrun)
+    months = np.zeros(overrun.shape, dtype=np.int64)
+    months[valid] = np.round(overrun[valid] / monthly_rate[valid])
+    return months if horizon is None else np.minimum(months, horizon)
+
+
+def forecast_columns(values):
+    """Frame of 'Forecast Month i' columns for a burn-down matrix, dropping the trailing all-NaN months."""
+    width = int(np.max(np.nonzero(~np.isnan(values).all(axis=0))[0], initial=-1)) + 1
+    return pd.DataFrame(values[:, :width], columns=[f'Forecast Month {i}' for i in range(1, width + 1)])
+
+
+def dynamic_forecast(NRE_summary, kit_summary, horizon=None):
+    """Return the month by month forecast of the remaining NRE and Kit budgets.
+
+    The Total NRE overrun is burnt down at the average total NRE actuals per month and the
+    Manufacturing Labor row repeats its monthly average until the Kit overrun is covered.
+    At most horizon months are forecast, MAX_FORECAST_MONTHS when horizon is not given;
+    the categories cut off before their overrun is covered are listed in attrs['truncated'].
+    """
+    horizon = horizon or MAX_FORECAST_MONTHS
+    categories = ['Engineering Labor', 'Other NRE', 'Travel', 'Total NRE', 'Manufacturing Labor', 'Material Receipts', 'Total Kits']
+    remaining = np.array([NRE_summary.loc['Engineering Labor', 'Remaining on Budget'], NRE_summary.loc['Other NRE', 'Remaining on Budget'],
+                          NRE_summary.loc['TRAVEL', 'Remaining on Budget'], NRE_summary.loc['Total', 'Remaining on Budget'],
+                          kit_summary.loc['Manufacturing Labor', 'Remaining on Budget'], kit_summary.loc['Material Receipts', 'Remaining on Budget'],
+                          kit_summary.loc['Total', 'Remaining on Budget']], dtype=np.float64)
+
+    nre_rate = float(NRE_summary.loc['Average Total', 'Actual Revenues'])
+    labor_rate = float(kit_summary.loc['Average Manufacturing Labor', 'Actual Revenues'])
+    kit_overrun = -remaining[6] if remaining[4] < 0 else 0.0
+
+    # only the Total NRE and Manufacturing Labor rows are forecast
+    start = np.zeros(len(categories))
+    step = np.zeros(len(categories))
+    overrun = np.zeros(len(categories))
+    rate = np.zeros(len(categories))
+    start[3], step[3], overrun[3], rate[3] = remaining[3], nre_rate, -remaining[3], nre_rate
+    start[4], overrun[4], rate[4] = labor_rate, kit_overrun, labor_rate
+
+    months = months_to_recover(overrun, rate)
+    data_table = forecast_columns(burn_down(start, step, months, horizon))
+    data_table.insert(0, 'Category', categories)
+    data_table.attrs['truncated'] = [c for c, m in zip(categories, months) if m > horizon]
+    return data_table
+
+
+def forecast_comparison(NRE_comparison, kit_comparison, number_of_kits, horizon=None):
+    """Return the Total NRE and Manufacturing Labor forecasts of every project of the compare_wip summaries.
+
+    As in dynamic_forecast, the (Project, Category) rows cut off at the horizon are listed in attrs['truncated'].
+    """
+    horizon = horizon or MAX_FORECAST_MONTHS
+
+    def rows(comparison, category):
+        # unlike xs, an empty comparison gives an empty selection
+        return comparison[comparison.index.get_level_values('Category') == category].droplevel('Category')
+
+    nre_total = rows(NRE_comparison, 'Total')
+    kit_total = rows(kit_comparison, 'Total')
+    labor = rows(kit_comparison, 'Manufacturing Labor')
+    projects = nre_total.index
+
+    nre_rate = (nre_total['Actual Revenues'] / number_of_kits).to_numpy()
+    labor_rate = (labor['Actual Revenues'] / number_of_kits).to_numpy()
+    kit_overrun = np.where(labor['Remaining on Budget'] < 0, -kit_total['Remaining on Budget'], 0.0)
+
+    start = np.concatenate([nre_total['Remaining on Budget'].to_numpy(), labor_rate])
+    step = np.concatenate([nre_rate, np.zeros(len(projects))])
+    months = months_to_recover(np.concatenate([-nre_total['Remaining on Budget'].to_numpy(), kit_overrun]),
+                               np.concatenate([nre_rate, labor_rate]))
+    forecast = forecast_columns(burn_down(start, step, months, horizon))
+    forecast.index = pd.MultiIndex.from_arrays([list(projects) * 2, ['Total NRE'] * len(projects) + ['Manufacturing Labor'] * len(projects)],
+                                               names=['Project', 'Category'])
+    truncated = forecast.index[months > horizon].tolist()
+    forecast = forecast.sort_index(level='Project', sort_remaining=False)
+    forecast.attrs['truncated'] = truncated
+    return forecast
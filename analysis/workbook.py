@@ -0,0 +1,260 @@
+"""Parse-once cache for uploaded Excel workbooks.
+
+Every page reads the same uploaded workbook on every Streamlit rerun. Each distinct
+file content is opened once as a Workbook, which reads the sheet directory up front
+and parses individual sheets on first access. Parsed sheets and everything derived
+from them are kept in one process-wide LRU cache keyed by content digest, so widget
+clicks, page switches and every session that uploads the same file share a single
+copy. The cache holds at most ANALYSIS_CACHE_MB megabytes (512 by default) and counts
+its hits, misses and evictions.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from analysis.revenue import DATE_FORMAT, FIRST_MONTH_COLUMN, REVENUE_SHEET, REVENUE_SKIPROWS, month_columns
+from analysis.streaming import stream_revenue_actuals
+
+MAX_CACHE_BYTES = int(os.environ.get('ANALYSIS_CACHE_MB', '512')) * 1024 * 1024
+
+# Streamlit uploads carry a stable file_id, so the content hash is only computed once per upload
+_digests = OrderedDict()
+MAX_DIGESTS = 4096
+
+
+def read_bytes(source):
+    """Return the raw bytes of an uploaded file, file object, path or bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        source.seek(0)
+        data = source.read()
+        source.seek(0)
+        return data
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def file_digest(source):
+    """Return the sha256 hex digest of the file contents."""
+    file_id = getattr(source, 'file_id', None)
+    if file_id is not None and file_id in _digests:
+        return _digests[file_id]
+    digest = hashlib.sha256(read_bytes(source)).hexdigest()
+    if file_id is not None:
+        _digests[file_id] = digest
+        while len(_digests) > MAX_DIGESTS:
+            _digests.popitem(last=False)
+    return digest
+
+
+def frame_nbytes(value):
+    """Approximate memory footprint of a cached value in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum()) if isinstance(value, pd.DataFrame) else int(usage)
+    if isinstance(value, tuple):
+        return sum(frame_nbytes(v) for v in value)
+    if isinstance(value, bytes):
+        return len(value)
+    return int(getattr(value, 'nbytes', 0))
+
+
+class WorkbookCache:
+    """LRU cache of parsed sheets and derived results with a cap on the total memory held.
+
+    Concurrent loads of the same key wait for the first one instead of loading it again.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._total
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def _lookup(self, key, count=True):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += count
+                return _MISSING
+            self.hits += count
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        size = frame_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total += size
+            # always keep the newest entry, even if it alone exceeds the cap
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_key, _ = self._entries.popitem(last=False)
+                self._total -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() to fill it on a miss."""
+        value = self._lookup(key, count=False)
+        if value is _MISSING:
+            with self._lock:
+                loading = self._loading.setdefault(key, threading.Lock())
+            with loading:
+                value = self._lookup(key, count=False)
+                if value is _MISSING:
+                    with self._lock:
+                        self.misses += 1
+                    try:
+                        value = loader()
+                        self.put(key, value)
+                    finally:
+                        with self._lock:
+                            self._loading.pop(key, None)
+                    return value
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def stats(self):
+        """Return the entry count, bytes held, byte budget and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self._total, 'max_bytes': self.max_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total = 0
+
+
+_MISSING = object()
+
+cache = WorkbookCache()
+
+
+class Workbook:
+    """An uploaded workbook opened once, with sheets parsed on first access."""
+
+    def __init__(self, data, digest=None):
+        self.digest = digest or hashlib.sha256(data).hexdigest()
+        self.nbytes = len(data)
+        # openpyxl opens the file read-only here: the sheet directory is read, cell data is not
+        self._excel_file = pd.ExcelFile(io.BytesIO(data))
+        self._lock = threading.Lock()
+
+    @property
+    def sheet_names(self):
+        return self._excel_file.sheet_names
+
+    def sheet(self, sheet_name, skiprows=0):
+        """Return a parsed sheet, parsing it only on the first request.
+
+        The returned frame is shared between pages and reruns and must not be modified in place.
+        """
+        return cache.get_or_load((self.digest, sheet_name, skiprows), lambda: self._parse(sheet_name, skiprows))
+
+    def _parse(self, sheet_name, skiprows):
+        # the read-only openpyxl workbook is not safe to parse from several sessions at once
+        with self._lock:
+            return self._excel_file.parse(sheet_name, skiprows=skiprows)
+
+    def revenue_actuals(self, projects=None, start=None, end=None):
+        """Return the Revenue Actuals rows of the selected projects and months, all of them by default.
+
+        Selections are streamed from the sheet, keeping only the selected rows and columns,
+        unless the whole sheet has already been loaded, in which case they are sliced from it.
+        """
+        full_key = (self.digest, REVENUE_SHEET, REVENUE_SKIPROWS)
+        if projects is None and start is None and end is None:
+            return cache.get_or_load(full_key, lambda: self._stream())
+        full = cache.get(full_key)
+        if full is not None:
+            return select_revenue_actuals(full, projects, start, end)
+        selection = (tuple(projects) if projects is not None else None, start, end)
+        return cache.get_or_load((self.digest, REVENUE_SHEET, selection), lambda: self._stream(projects, start, end))
+
+    def revenue_index(self, full=False):
+        """Return the descriptive columns of Revenue Actuals (Project #, Category, ...) without the amounts.
+
+        With full, the whole sheet is loaded and the index sliced from it, so a page that
+        reads the whole sheet anyway parses it once instead of streaming the index first.
+        """
+        if full:
+            return self.revenue_actuals().iloc[:, :FIRST_MONTH_COLUMN]
+        full = cache.get((self.digest, REVENUE_SHEET, REVENUE_SKIPROWS))
+        if full is not None:
+            return full.iloc[:, :FIRST_MONTH_COLUMN]
+        return cache.get_or_load((self.digest, REVENUE_SHEET, 'index'), lambda: self._stream(months=False))
+
+    def _stream(self, projects=None, start=None, end=None, months=True):
+        with self._lock:
+            worksheet = self._excel_file.book[REVENUE_SHEET]
+            return stream_revenue_actuals(worksheet, projects, start, end, months=months)
+
+
+def open_workbook(source):
+    """Return the Workbook of an uploaded file, opening it only once per file content."""
+    digest = file_digest(source)
+    return cache.get_or_load((digest, None, 'workbook'), lambda: Workbook(read_bytes(source), digest))
+
+
+def read_sheet(source, sheet_name, skiprows=0):
+    """Return a parsed sheet of the workbook, see Workbook.sheet."""
+    return open_workbook(source).sheet(sheet_name, skiprows)
+
+
+def read_revenue_actuals(source, projects=None, start=None, end=None):
+    """Return the 'Revenue Actuals ' sheet below its 33 row preamble, see Workbook.revenue_actuals."""
+    return open_workbook(source).revenue_actuals(projects, start, end)
+
+
+def read_revenue_index(source, full=False):
+    """Return the descriptive columns of the 'Revenue Actuals ' sheet, see Workbook.revenue_index."""
+    return open_workbook(source).revenue_index(full)
+
+
+def select_revenue_actuals(revenue_actuals, projects=None, start=None, end=None):
+    """Slice a Revenue Actuals frame to the given projects and months (start and end inclusive)."""
+    if projects is not None:
+        revenue_actuals = revenue_actuals[revenue_actuals['Project #'].isin(projects)]
+    if start is not None or end is not None:
+        dates = pd.to_datetime(month_columns(revenue_actuals), format=DATE_FORMAT)
+        in_range = (dates >= pd.Timestamp(start or dates.min())) & (dates <= pd.Timestamp(end or dates.max()))
+        columns = revenue_actuals.columns
+        revenue_actuals = revenue_actuals[columns[:FIRST_MONTH_COLUMN].tolist() + month_columns(revenue_actuals)[in_range].tolist() + [columns[-1]]]
+    return revenue_actuals
+
+
+def sheet_names(source):
+    """Return the sheet names of the workbook."""
+    return open_workbook(source).sheet_names
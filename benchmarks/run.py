@@ -0,0 +1,133 @@
+"""Timing benchmarks of the analysis paths on synthetic workbooks.
+
+Each scale is a synthetic workbook of projects x months x categories. The median time of
+every stage is compared against a stored baseline and stages slower than the baseline by
+more than the tolerance are reported as regressions (exit status 1).
+
+    python -m benchmarks.run                        # all scales, compare with benchmarks/baseline.json
+    python -m benchmarks.run --scales small medium
+    python -m benchmarks.run --save-baseline        # record the current timings as the baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+from analysis.budget import read_budget_lines
+from analysis.flags import flag_table
+from analysis.revenue import prepare_dataframe
+from analysis.synthetic import generate_workbook
+from analysis.wip import dynamic_forecast, process_revenue_actuals, wip_summaries
+from analysis.workbook import cache, read_revenue_actuals
+
+# projects, months, categories
+SCALES = {
+    'small': (5, 24, 8),
+    'medium': (25, 48, 8),
+    'large': (100, 60, 12),
+}
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+NUMBER_OF_KITS = 21
+# differences below this many seconds are timer noise, never regressions
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def workbook_path(scale, seed=0):
+    """Return the synthetic workbook of a scale, generating it on first use."""
+    projects, months, categories = SCALES[scale]
+    path = os.path.join(tempfile.gettempdir(), f'analysis-bench-{projects}x{months}x{categories}-{seed}.xlsx')
+    if not os.path.exists(path):
+        generate_workbook(path, projects, months, categories, text_amounts=0.1, seed=seed)
+    return path
+
+
+def median_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def bench_scale(path, repeat=5):
+    """Return the median seconds of each analysis stage on one workbook."""
+    def load():
+        cache.clear()
+        read_revenue_actuals(path)
+
+    results = {'load': median_time(load, repeat)}
+
+    revenue_actuals = read_revenue_actuals(path)
+    projects = revenue_actuals['Project #'].unique().tolist()
+    categories = revenue_actuals['Category'].unique().tolist()
+    results['prepare_dataframe'] = median_time(lambda: prepare_dataframe(revenue_actuals, projects, categories, cumulative=True), repeat)
+
+    budget_lines = {p: read_budget_lines(path, p) for p in projects}
+    results['flags'] = median_time(lambda: [flag_table(budget_lines[p], revenue_actuals, p) for p in projects], repeat)
+
+    def summarize():
+        return [wip_summaries(budget_lines[p], process_revenue_actuals(revenue_actuals, [p]), NUMBER_OF_KITS) for p in projects]
+
+    results['summarize_budget'] = median_time(summarize, repeat)
+
+    summaries = summarize()
+    results['wip_forecast'] = median_time(lambda: [dynamic_forecast(nre, kit) for nre, kit, _ in summaries], repeat)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return (scale, stage, baseline, current) for every stage slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for scale, stages in results.items():
+        for stage, seconds in stages.items():
+            reference = baseline.get(scale, {}).get(stage)
+            if reference is not None and seconds > reference * (1 + tolerance) and seconds - reference > MIN_REGRESSION_SECONDS:
+                regressions.append((scale, stage, reference, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the analysis paths on synthetic workbooks.')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=5, help='runs per stage, the median is reported')
+    parser.add_argument('--baseline', default=BASELINE, help='JSON file of baseline timings')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a stage is a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='write the timings of this run as the baseline')
+    args = parser.parse_args(argv)
+    # pandas deprecation chatter would drown the report
+    warnings.simplefilter('ignore', FutureWarning)
+
+    results = {}
+    for scale in args.scales:
+        results[scale] = bench_scale(workbook_path(scale), args.repeat)
+        for stage, seconds in results[scale].items():
+            print(f'{scale:<8} {stage:<18} {seconds * 1000:10.1f} ms')
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, run with --save-baseline to record one')
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for scale, stage, reference, seconds in regressions:
+        print(f'REGRESSION {scale} {stage}: {reference * 1000:.1f} ms -> {seconds * 1000:.1f} ms')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
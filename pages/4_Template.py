@@ -1,4 +1,5 @@
 import streamlit as st
+from analysis.projects import NRE_ENTRIES, RECURRING_ENTRIES, UNBUDGETED_ENTRIES, save_project
 
 def show_project_entry_page():
     st.title("New Project Entry")
@@ -17,19 +18,32 @@ def show_project_entry_page():
         st.session_state.recurring_count += 1
 
     def process_form_data():
-        # Process and save the form data here
+        # Save the submitted entries to the local store; widget values are read from session state
+        # because the callback runs before the page is rerun
+        state = st.session_state
+        project_name = state.project_name.strip()
+        if not project_name:
+            st.error("Please enter a project name.")
+            return
+        entries = [('NRE', state[f'nre_category_{i}'], state[f'nre_cost_{i}']) for i in range(state.nre_count)]
+        entries += [('Recurring', state[f'recurring_category_{i}'], state[f'recurring_cost_{i}']) for i in range(state.recurring_count)]
+        save_project(project_name, entries, state.hourly_rate, state.project_date, state.number_of_kits)
         st.success(f"Project '{project_name}' created successfully!")
+        unbudgeted = sorted({entry for _, entry, cost in entries if entry in UNBUDGETED_ENTRIES and cost})
+        if unbudgeted:
+            st.warning(f"{' and '.join(unbudgeted)} costs are saved but count towards no budget category, so the Flags and WIP pages leave them out.")
 
     with st.form(key='project_form'):
-        project_name = st.text_input('Project Name', placeholder='Enter Project Name')
-        hourly_rate = st.number_input('Hourly Rate', min_value=0.00, format="%.2f")
-        project_date = st.date_input('Project Date')
+        project_name = st.text_input('Project Name', placeholder='Enter Project Name', key='project_name')
+        hourly_rate = st.number_input('Hourly Rate', min_value=0.00, format="%.2f", key='hourly_rate')
+        project_date = st.date_input('Project Date', key='project_date')
+        number_of_kits = st.number_input('Number of Kits', min_value=0, value=0, step=1, key='number_of_kits')
 
         # NON RECURRING BUDGET Section
         non_recurring_budget = st.expander("NON RECURRING BUDGET Details", expanded=True)
         with non_recurring_budget:
             st.subheader(project_name + " - Non-Recurring Budget")
-            nre_options = ["Labor", "Travel", "Other NRE"]
+            nre_options = NRE_ENTRIES
             for i in range(st.session_state.nre_count):
                 with st.container():
                     selected_nre = st.selectbox(f'NRE Category {i+1}', nre_options, key=f'nre_category_{i}')
@@ -39,7 +53,7 @@ def show_project_entry_page():
         recurring_budget = st.expander("RECURRING BUDGET Details", expanded=True)
         with recurring_budget:
             st.subheader(project_name + " - Recurring Budget")
-            re_options = ["Monuments", "Panels", "Kits (Materials Receipts)", "Kits (Manufacturing Labor)"]
+            re_options = RECURRING_ENTRIES
             kits_subcategories = ["Materials", "Receipts", "Labor"]
             for i in range(st.session_state.recurring_count):
                 with st.container():
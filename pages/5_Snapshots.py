@@ -0,0 +1,52 @@
+import streamlit as st
+from analysis.snapshots import ingest, list_snapshots, snapshot_delta
+from ui.profiling import page_profiler
+
+# Set up the page
+st.set_page_config(page_title="Snapshots", layout="wide")
+st.title("Snapshots")
+st.write("This page compares the monthly versions of the workbook stored in the local snapshot store.")
+
+profiler = page_profiler('Snapshots')
+
+# Store the uploaded workbook as a new snapshot
+uploaded_file = st.sidebar.file_uploader("Choose a file")
+if uploaded_file is not None:
+    as_of = st.sidebar.date_input('Snapshot month', help='First month counted as forecast rather than actuals')
+    snapshot_name = st.sidebar.text_input('Snapshot name', value=as_of.strftime('%Y-%m'))
+    if st.sidebar.button('Store snapshot'):
+        with profiler.span('ingest'):
+            try:
+                sheets = ingest(uploaded_file, snapshot_name, as_of)
+            except ValueError as e:
+                st.sidebar.error(str(e))
+            else:
+                if sheets.empty:
+                    st.sidebar.info("This workbook is already stored.")
+                else:
+                    st.sidebar.success(f"{int(sheets['Stored'].sum())} sheets stored, {int((~sheets['Stored']).sum())} unchanged")
+
+snapshots = list_snapshots()
+st.write("Stored Snapshots:", snapshots.drop(columns='Digest'))
+if len(snapshots) < 2:
+    st.info("Store at least two snapshots to compare them.")
+    st.stop()
+
+# Snapshot picker
+names = snapshots['Name'].tolist()
+col1, col2 = st.columns(2)
+base = col1.selectbox('Base snapshot', names, index=len(names) - 2)
+compare = col2.selectbox('Compare with', names, index=len(names) - 1)
+
+with profiler.span('delta'):
+    delta = snapshot_delta(base, compare)
+projects = st.multiselect('Projects', delta.index.get_level_values('Project #').unique())
+if projects:
+    delta = delta[delta.index.get_level_values('Project #').isin(projects)]
+if st.checkbox('Only changed rows', True):
+    delta = delta[delta.filter(like='change').fillna(0).abs().gt(0.005).any(axis=1)]
+
+st.write("Month over Month Delta:")
+with profiler.span('table render'):
+    st.dataframe(delta.round(2))
+st.download_button("Download data as CSV", delta.to_csv(), "snapshot_delta.csv", "text/csv", key='download-delta-csv')
@@ -0,0 +1 @@
+"""Streamlit components shared by the dashboard pages."""
@@ -0,0 +1,51 @@
+"""Sidebar progress of the background precomputation of an uploaded workbook."""
+import streamlit as st
+
+from analysis.precompute import start_precompute
+
+REFRESH_SECONDS = 1
+# set by the progress fragment for the page run that stops its polling
+_RERUN = 'precompute-rerun'
+_RESUMED = 'precompute-resumed'
+
+
+def precompute_progress(source, number_of_kits=None):
+    """Start the warm-up of the workbook and show its progress in the sidebar.
+
+    The progress bar refreshes on its own, without rerunning the page. Its timer is set
+    when the fragment is registered, so once every project is ready the fragment reruns
+    the page once to register it without one; pages whose results would be lost by that
+    rerun keep them with keep_results.
+    """
+    st.session_state[_RESUMED] = st.session_state.pop(_RERUN, False)
+    warmup = start_precompute(source, number_of_kits)
+    polling = not warmup.finished
+    # the first call runs inline with the page, later ones are the timed fragment reruns
+    inline = [True]
+
+    @st.fragment(run_every=REFRESH_SECONDS if polling else None)
+    def progress():
+        if warmup.finished and polling and not inline[0]:
+            st.session_state[_RERUN] = True
+            st.rerun(scope='app')
+        inline[0] = False
+        if warmup.error is not None:
+            st.error(f'Precomputation failed: {warmup.error}')
+        elif warmup.finished:
+            st.caption(f'{warmup.total} projects precomputed')
+        elif not warmup.total:
+            st.progress(0.0, text='Reading the workbook...')
+        else:
+            st.progress(warmup.done / warmup.total, text=f'Precomputing projects {warmup.done}/{warmup.total}')
+
+    with st.sidebar:
+        progress()
+    return warmup
+
+
+def keep_results(clicked, key):
+    """Return True when a page shows the results of its button: on the run it was clicked,
+    and on the rerun that stops the progress polling while they were shown."""
+    show = clicked or (st.session_state.get(_RESUMED, False) and st.session_state.get(key, False))
+    st.session_state[key] = show
+    return show
@@ -0,0 +1,27 @@
+"""Sidebar panel showing the stage timings of the current page run."""
+import streamlit as st
+
+from analysis.profiling import MB, Profiler
+from analysis.workbook import cache
+
+
+def page_profiler(page):
+    """Return the Profiler of this page run.
+
+    With 'Show timings' ticked in the sidebar, the panel below it is refreshed after every
+    stage, so it is complete even when the page stops early. It also shows the use of the
+    shared cache of the process.
+    """
+    if not st.sidebar.checkbox('Show timings', False, key='show-timings'):
+        return Profiler(page)
+    panel = st.sidebar.empty()
+
+    def render(profiler):
+        with panel.container():
+            st.caption(f'{profiler.page}: {profiler.total_seconds * 1000:.0f} ms')
+            st.dataframe(profiler.frame())
+            stats = cache.stats()
+            st.caption(f"Shared cache: {stats['entries']} entries, {stats['bytes'] / MB:.0f} of {stats['max_bytes'] / MB:.0f} MB, "
+                       f"{stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+
+    return Profiler(page, on_span=render)
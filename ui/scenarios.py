@@ -0,0 +1,40 @@
+"""What-if sensitivity panel of the WIP page."""
+import numpy as np
+import streamlit as st
+
+from analysis.charts import sensitivity_heatmap
+from analysis.scenarios import SCENARIO_CATEGORIES, SCENARIO_MEASURES, kit_grid, scenario_inputs, sensitivity
+from analysis.wip import MAX_FORECAST_MONTHS
+
+MAX_SCENARIO_MONTHS = 60
+# kit counts of the grid, spread over the selected range
+KIT_POINTS = 50
+MAX_KIT_POINTS = 200
+
+
+@st.fragment
+def sensitivity_panel(NRE_summary, kit_summary, number_of_kits, number_of_months=0):
+    """Show the remaining budget or cost per kit over a range of kit counts and forecast months.
+
+    The panel is a fragment: changing its ranges recomputes the grid without rerunning
+    the page.
+    """
+    st.subheader("What-if Sensitivity")
+    col1, col2, col3, col4 = st.columns(4)
+    kit_range = col1.slider('Number of Kits', 1, max(4 * number_of_kits, 50),
+                            (max(1, number_of_kits // 2), 2 * number_of_kits), key='sensitivity_kits')
+    kit_points = col2.number_input('Kit counts', min_value=2, max_value=MAX_KIT_POINTS, value=KIT_POINTS, key='sensitivity_kit_points',
+                                   help='Number of kit counts in the range, spread evenly')
+    max_months = max(MAX_SCENARIO_MONTHS, min(number_of_months, MAX_FORECAST_MONTHS))
+    month_range = col3.slider('Forecast Months', 0, max_months, (0, min(number_of_months, max_months) or 12), key='sensitivity_months')
+    category = col4.selectbox('Category', SCENARIO_CATEGORIES, index=SCENARIO_CATEGORIES.index('Total NRE'), key='sensitivity_category')
+    measure = st.radio('Measure', SCENARIO_MEASURES, horizontal=True, key='sensitivity_measure')
+
+    kits = kit_grid(kit_range[0], kit_range[1], kit_points)
+    months = np.arange(month_range[0], month_range[1] + 1)
+    table = sensitivity(scenario_inputs(NRE_summary, kit_summary), kits, months)[measure].loc[category]
+
+    if st.toggle('Heatmap', True, key='sensitivity_heatmap'):
+        st.plotly_chart(sensitivity_heatmap(table, f'{category} {measure}', zmid=0 if measure == 'Remaining on Budget' else None))
+    else:
+        st.dataframe(table.round(2))
@@ -0,0 +1,33 @@
+"""Paged tables: the frame stays on the server and only the visible rows are sent."""
+import numpy as np
+import streamlit as st
+
+PAGE_SIZES = [50, 200, 1000]
+HIGHLIGHT = 'background-color: red;'
+
+
+@st.fragment
+def paged_table(frame, key, highlight=None):
+    """Show frame one page of rows at a time, with its cells highlighted where the masks are true.
+
+    highlight maps column names to boolean masks aligned with the rows of frame. Frames
+    that fit on the first page size are shown whole, without page controls. Paging only
+    reruns the table.
+    """
+    start, stop = 0, len(frame)
+    if len(frame) > PAGE_SIZES[0]:
+        col1, col2, col3 = st.columns([1, 1, 4])
+        page_size = col2.selectbox('Rows per page', PAGE_SIZES, key=f'{key}-page-size')
+        pages = -(-len(frame) // page_size)
+        page = min(col1.number_input('Page', min_value=1, value=1, step=1, key=f'{key}-page'), pages)
+        start, stop = (page - 1) * page_size, min(page * page_size, len(frame))
+        col3.caption(f'Rows {start + 1}-{stop} of {len(frame)}, page {page} of {pages}')
+    window = frame.iloc[start:stop]
+
+    if highlight:
+        styler = window.style
+        for column, mask in highlight.items():
+            css = np.where(np.asarray(mask)[start:stop], HIGHLIGHT, '')
+            styler = styler.apply(lambda _, css=css: css, subset=[column])
+        window = styler
+    st.dataframe(window)